@@ -38,6 +38,12 @@ st.set_page_config(page_title="GeoDashboard", layout="wide", initial_sidebar_sta
 
 st.markdown('<link href="styles.css" rel="stylesheet">', unsafe_allow_html=True)
 
+# --- Start loading every layer in the background (once per server process) ---
+# and pin the current data snapshot so this whole rerun reads consistent data
+from utils.load_once import pin_snapshot
+
+pin_snapshot()
+
 # --- Session State Initialization ---
 if "auth" not in st.session_state:
     st.session_state["auth"] = False
@@ -6,7 +6,6 @@ from folium.plugins import MarkerCluster
 from streamlit_folium import st_folium, folium_static
 from folium import plugins as fp
 from folium.features import GeoJsonTooltip
-from branca.colormap import linear, ColorMap, LinearColormap
 
 import matplotlib.pyplot as plt
 import base64
@@ -14,32 +13,27 @@ from io import BytesIO
 from pathlib import Path
 
 # --- Load data ---
-# from utils.load_once import load_data_once
-
-# load_data_once()
-
-base_path = Path(__file__).resolve().parent.parent  # client_portal/
-data_path = base_path.parent / "shared_data" / "geojson_files"
-
-if "p_benteib_quartiers" not in st.session_state:
-    st.session_state["p_benteib_quartiers"] = gpd.read_file(data_path / "pacha_benteib_quartiers.geojson")
-
-if "p_benteib_puits" not in st.session_state:
-    st.session_state["p_benteib_puits"] = gpd.read_file(data_path / "pacha_benteib_puits.geojson")
-
-if "p_benteib_mosq" not in st.session_state:
-    st.session_state["p_benteib_mosq"] = gpd.read_file(data_path / "pacha_benteib_mosq.geojson")
-
-p_benteib_quartiers = st.session_state["p_benteib_quartiers"]
-p_benteib_mosq = st.session_state["p_benteib_mosq"]
-p_benteib_puits = st.session_state["p_benteib_puits"]
+from utils.catalog import layer_center
+from utils.load_once import cache_entries, layer_handle
+from utils.colors import legend
+from utils.maps import choropleth_layer, clone_map, color_style, get_colored_geojson, get_map_layer
+from utils.points import get_point_geojson, point_layer
+from utils.tiles import tile_layer
+
+QUARTIER_FIELDS = [
+    "Nom_quarti", "annexe", "Popul", "typ_Qrt", "covr_eau", "covr_assin", "covr_elect", "taux_godrn", "taux_eclr",
+]
+PUITS_FIELDS = [("Quartier", "Adresse"), ("Autorisation", "Autorisati"), ("Profondeur", "Profondeur")]
+p_benteib_puits_geojson = get_point_geojson("pacha_benteib_puits", ["Adresse"], PUITS_FIELDS)  # one layer, popups included
 
 st.title("🗺️ Map of Pachalik Ben Teib")
 
 
-# @st.cache_resource
-def create_map(_p_benteib_quartiers_data):
-    m = folium.Map(location=[35.03, -3.47], zoom_start=13, control_scale=True)
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(1))
+def create_map(quartiers):
+    p_benteib_quartiers = get_map_layer(quartiers, QUARTIER_FIELDS)
+    p_benteib_quartiers_geojson = get_colored_geojson(quartiers, QUARTIER_FIELDS, "Popul")
+    m = folium.Map(location=layer_center("pacha_benteib_quartiers"), zoom_start=13, control_scale=True, prefer_canvas=True)
     
     # folium.TileLayer("OpenStreetMap", name="OpenStreetMap").add_to(m)
     folium.TileLayer("CartoDB positron", name="CartoDB Positron").add_to(m)
@@ -66,40 +60,10 @@ def create_map(_p_benteib_quartiers_data):
     # Create ONE FeatureGroup for both the choropleth-like layer and its tooltip layer
     fg_pacha_combined = folium.FeatureGroup(name="Pachalik").add_to(m)
 
-    # Ensure 'Popul' column is numeric for colormap scaling
-    if not pd.api.types.is_numeric_dtype(_p_benteib_quartiers_data['Popul']):
-        _p_benteib_quartiers_data['Popul'] = pd.to_numeric(_p_benteib_quartiers_data['Popul'], errors='coerce')
-        _p_benteib_quartiers_data.dropna(subset=['Popul'], inplace=True) 
-
-    min_bv = _p_benteib_quartiers_data['Popul'].min()
-    max_bv = _p_benteib_quartiers_data['Popul'].max()
-    
-    ylorrd_colors = [
-        '#FFFFCC', '#FFEDA0', '#FED976', '#FEB24C', '#FD8D3C',
-        '#FC4E2A', '#E31A1C', '#BD0026', '#800026'
-    ]
+    min_bv = p_benteib_quartiers['Popul'].min()
+    max_bv = p_benteib_quartiers['Popul'].max()
     
-    if min_bv == max_bv:
-        colormap = LinearColormap([ylorrd_colors[0]], vmin=min_bv, vmax=max_bv, caption="Population")
-    else:
-        colormap = LinearColormap(ylorrd_colors, vmin=min_bv, vmax=max_bv, caption="Population")
-
-    def style_function_choropleth(feature):
-        bv_value = feature['properties']['Popul']
-        return {
-            'fillColor': colormap(bv_value) if pd.notnull(bv_value) else '#cccccc',
-            'color': 'black',
-            'weight': 0.5,
-            'fillOpacity': 0.7
-        }
-
-    # Add the Choropleth-like GeoJson to the COMBINED FeatureGroup
-    folium.GeoJson(
-        _p_benteib_quartiers_data.__geo_interface__,
-        style_function=style_function_choropleth,
-        highlight_function=lambda x: {'fillOpacity': 0.9},
-        name="Pachalik - Population Visual" # This name will show up if you inspect individual layers, but the FG name controls LayerControl
-    ).add_to(fg_pacha_combined)
+    colormap = legend(min_bv, max_bv, "Population")
 
     # Add the colormap legend directly to the map
     colormap.add_to(m) # Colormap legend remains independent for clarity
@@ -121,44 +85,35 @@ def create_map(_p_benteib_quartiers_data):
         max_width=800,
     )
     
-    # Add the Tooltip GeoJson to the *SAME* COMBINED FeatureGroup
-    folium.GeoJson(
-        _p_benteib_quartiers_data,
-        style_function=lambda x: {
-            "fillOpacity": 0,
-            "color": "transparent", # Make the fill transparent so only the tooltip interacts
-            "weight": 0,
-        },
+    # Styled layer with its tooltip and highlight, in the combined FeatureGroup
+    choropleth_layer(
+        p_benteib_quartiers_geojson,
+        style_function=color_style(color="black", weight=0.5, fillOpacity=0.7),
         tooltip=tooltip_p,
-        name="Pachalik - Details Tooltip" # Name for internal reference, not for LayerControl directly
-    ).add_to(fg_pacha_combined) # Crucial: add to the combined FG
+        name="Pachalik - Population Visual",
+    ).add_to(fg_pacha_combined)
 
     return m
 
 # st.subheader("🗺️ Thematic map")
 
 # --- Get the cached base map ---
-m = create_map(p_benteib_quartiers)
+m = clone_map(create_map(layer_handle("pacha_benteib_quartiers")))
 
 # ➕ Add new layer: Douars (no clustering)
 fg_puits = folium.FeatureGroup(name="Puits").add_to(m)
 
 
-for idx, row in p_benteib_puits.iterrows():
-    popup_puit = f"""
-    <b>Quartier:</b> {row['Adresse']}<br>
-    <b>Autorisation:</b> {row['Autorisati']}<br>
-    <b>Profondeur:</b> {row['Profondeur']}<br>
-    """    
-    folium.CircleMarker(
-        location=[row.geometry.y, row.geometry.x],
-        radius=2,
-        color="blue",
-        fill=True,
-        fill_opacity=0.8,
-        tooltip=row['Adresse'],
-        popup=folium.Popup(popup_puit, max_width=300)
-    ).add_to(fg_puits)
+# Vector tiles when built (only the tiles in view are fetched), else inline GeoJSON
+puits_layer = tile_layer("pacha_benteib_puits", {"radius": 2, "color": "blue", "fillOpacity": 0.8},
+                         PUITS_FIELDS, "Adresse")
+if puits_layer is None:
+    puits_layer = point_layer(
+        p_benteib_puits_geojson,
+        marker=folium.CircleMarker(radius=2, color="blue", fill=True, fill_opacity=0.8),
+        tooltip_field="Adresse",
+    )
+puits_layer.add_to(fg_puits)
 
 
 # Add LayerControl at the end
@@ -2,9 +2,9 @@ import streamlit as st
 import geopandas as gpd
 from pathlib import Path
 import pandas as pd
+import json
 
 import altair as alt
-import plotly.express as px
 import plotly.graph_objects as go
 
 
@@ -22,26 +22,13 @@ st.title("🗺️ Oriental INDH Dashboard")
 alt.themes.enable("dark")
 
 # --- Load data ---
-# from utils.load_once import load_data_once
+from utils.catalog import layer_center
+from utils.load_once import cache_entries, layer_handle
+from utils.maps import get_geojson, get_geojson_url, get_map_layer
+from utils.points import get_point_arrays
 
-# load_data_once()
-
-base_path = Path(__file__).resolve().parent.parent  # client_portal/
-data_path = base_path.parent / "shared_data" / "geojson_files"
-
-
-if "gdf_province" not in st.session_state:
-    st.session_state["gdf_province"] = gpd.read_file(data_path / "prov.geojson")
-
-if "gdf_bv" not in st.session_state:
-    st.session_state["gdf_bv"] = gpd.read_file(data_path / "bv.geojson")
-
-if "gdf_douars" not in st.session_state:
-    st.session_state["gdf_douars"] = gpd.read_file(data_path / "douars.geojson")
-
-gdf_province = st.session_state["gdf_province"]
-gdf_bv = st.session_state["gdf_bv"]
-gdf_douars = st.session_state["gdf_douars"]
+# Douars hover text of the choropleth, templated once per douars version
+DOUAR_HOVER = (("Douar", "Douar"), ("Population", "Popul"))  # (label, column) pairs
 
 def make_bar(input_df, input_x, input_theme, input_color_theme):
     bar = alt.Chart(input_df).mark_bar().encode(
@@ -55,26 +42,62 @@ def make_bar(input_df, input_x, input_theme, input_color_theme):
     return bar
 
 # Choropleth map
-
-
-def make_choropleth(input_df, input_id, input_column, input_color_theme):
-    choropleth = px.choropleth_mapbox(
-        input_df,
-        geojson=input_df.__geo_interface__,
-        locations=input_id,
-        featureidkey=f"properties.{input_id}",
-        color=input_column,
-        color_continuous_scale=input_color_theme,
-        range_color=(0, input_df[input_column].max()),
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(1))
+def base_choropleth(prov, douars, input_id):
+    # Figure of one version of the layers: the communes are a
+    # GeoJSON URL the browser fetches once (inlined if static serving is off), and a
+    # rerun only sets z and the colour scale
+    communes = get_map_layer(prov, [input_id])
+    geojson = get_geojson_url(prov, [input_id]) or json.loads(get_geojson(prov, [input_id]))
+    douar_lon, douar_lat, hover_text = get_point_arrays(douars, DOUAR_HOVER)  # read-only, per douars version
+    choropleth = go.Figure([
+        go.Choroplethmapbox(
+            geojson=geojson,
+            locations=communes[input_id],
+            featureidkey=f"properties.{input_id}",
+            coloraxis="coloraxis",
+            marker_opacity=0.7,
+        ),
+        # Douars points on the same map
+        go.Scattermapbox(
+            lat=douar_lat,
+            lon=douar_lon,
+            mode='markers',
+            marker=go.scattermapbox.Marker(
+                size=9,
+                color='black',
+                symbol='circle'
+            ),
+            name='Douar',
+            text=hover_text,  # or any column you want in the hover tooltip
+        ),
+    ])
+    choropleth.update_layout(
         mapbox_style="carto-positron",  # This is the tile layer like in Folium
-        zoom=8,
-        center={"lat": 34.95, "lon": -3.39},
+        mapbox_zoom=8,
+        mapbox_center=dict(zip(("lat", "lon"), layer_center("prov"))),
         width=600,
         height=500,
-        opacity=0.7,
-        labels={input_column: input_column}
+        margin=dict(t=60),
+        uirevision=prov.version,  # keep the user's zoom/pan across theme changes
     )
+    return choropleth
+
 
+def make_choropleth(base, input_df, input_id, input_column, input_color_theme):
+    # Copy of the cached figure with this theme's values and colours (rows are in layer order)
+    choropleth = go.Figure(base)
+    choropleth.update_traces(
+        z=input_df[input_column],
+        hovertemplate=f"{input_id}=%{{location}}<br>{input_column}=%{{z}}<extra></extra>",
+        selector=dict(type="choroplethmapbox"),
+    )
+    choropleth.update_layout(coloraxis=dict(
+        colorscale=input_color_theme,
+        cmin=0,
+        cmax=input_df[input_column].max(),
+        colorbar=dict(title=dict(text=input_column)),
+    ))
     return choropleth
 
 # Calculation top_bottom_two_with_theme
@@ -107,6 +130,8 @@ with col[0]:
     theme_list = ["Menages", "Population", "Etrangers", "Marocains", "Sante", "Education", "AEP", "Elec", "Voirier", "Voirier_Q","BV"]
     
     selected_theme = st.selectbox('Select a theme', theme_list)
+    # Only the attributes drawn are read, so prov is fetched once the theme is chosen
+    gdf_province = get_map_layer("prov", ["commune_fr", selected_theme])
     df_sorted = gdf_province.sort_values(by=selected_theme, ascending=False)
 
     color_theme_list = ['blues', 'cividis', 'greens', 'inferno', 'magma', 'plasma', 'reds', 'rainbow', 'turbo', 'viridis']
@@ -152,28 +177,10 @@ with col[0]:
     
 with col[1]:
     st.markdown('#### Total Population')
-     
-    
-    gdf_douars["hover_text"] = (
-        "Douar:  " + gdf_douars["Douar"].astype(str) + "<br>" +
-        "Population:  " + gdf_douars["Popul"].astype(str) + "<br>"  
-    )     
-    
-    choropleth = make_choropleth(gdf_province, 'commune_fr', selected_theme, selected_color_theme)
-    # Add electoral office points to the same map
-    choropleth.add_trace(go.Scattermapbox(
-        lat=gdf_douars.geometry.y,
-        lon=gdf_douars.geometry.x,
-        mode='markers',
-        marker=go.scattermapbox.Marker(
-            size=9,
-            color='black',
-            symbol='circle'
-        ),
-        name='Douar',
-        text=gdf_douars["hover_text"],  # or any column you want in the hover tooltip
-    ))  
-    
+
+    base = base_choropleth(layer_handle("prov"), layer_handle("douars"), 'commune_fr')
+    choropleth = make_choropleth(base, gdf_province, 'commune_fr', selected_theme, selected_color_theme)
+
     st.plotly_chart(choropleth, use_container_width=True)
     
     bar= make_bar(df_sorted, 'commune_fr', selected_theme, selected_color_theme)
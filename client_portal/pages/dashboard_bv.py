@@ -6,7 +6,6 @@ from folium.plugins import MarkerCluster
 from streamlit_folium import st_folium, folium_static
 from folium import plugins as fp
 from folium.features import GeoJsonTooltip
-from branca.colormap import linear, ColorMap, LinearColormap
 
 import matplotlib.pyplot as plt
 import base64
@@ -14,44 +13,46 @@ from io import BytesIO
 from pathlib import Path
 
 # --- Load data ---
-# from utils.load_once import load_data_once
+from utils.catalog import layer_center
+from utils.load_once import cache_entries, layer_handle
+from utils.colors import legend
+from utils.maps import choropleth_layer, clone_map, color_style, get_colored_geojson, get_map_layer
+from utils.points import get_point_geojson, point_layer
+from utils.popups import DOUAR_FIELDS, clicked_row, get_popups, row_tooltip
+
+# Only the attributes shown in tooltips/popups are read
+PROV_FIELDS = ["region_fr", "province_f", "cercle_fr", "commune_fr", "milieu", "Population", "superficie", "BV"]
+gdf_bv = get_map_layer("bv", ["Nom_du__bu", "Couverture", "Couvertu_1", "Couvertu_2"])
+douars_geojson = get_point_geojson("douars", ["Douar"])
+
+# Popup HTML of every BV and douar, templated once per layer version. Lazy popups:
+# the markers carry none, the clicked one is shown beside the map
+BV_FIELDS = [
+    ("Bureau", "Nom_du__bu"), ("Commune", "Commune"), ("Province", "Province"), ("Machiakha", "Machiakha"),
+    ("Type", "Type_de_li"), ("Sensibilité", "Sensibilit"), ("Accessibilité", "Accessibil"), ("Électrifié", "Électrifi"),
+]
+bv_popups = get_popups("bv", BV_FIELDS, title="Bureau de vote:")
+douar_popups = get_popups("douars", DOUAR_FIELDS)
 
-# load_data_once()
-
-
-
-
-base_path = Path(__file__).resolve().parent.parent  # client_portal/
-data_path = base_path.parent / "shared_data" / "geojson_files"
-
-
-if "gdf_province" not in st.session_state:
-    st.session_state["gdf_province"] = gpd.read_file(data_path / "prov.geojson")
-
-if "gdf_bv" not in st.session_state:
-    st.session_state["gdf_bv"] = gpd.read_file(data_path / "bv.geojson")
-
-if "gdf_douars" not in st.session_state:
-    st.session_state["gdf_douars"] = gpd.read_file(data_path / "douars.geojson")
+st.title("🗺️ Map of Electoral offices")
 
+# --- Coverage charts ---
+# The chart only depends on the (IAM, INWI, ORANGE) coverage levels: at most 27
+# images, each drawn once per server process (instead of once per BV).
+COVERAGE_FIELDS = ["Couverture", "Couvertu_1", "Couvertu_2"]  # IAM, INWI, ORANGE
+COVERAGE_LEVELS = {"Faible": 25, "Moyenne": 50, "Bonne": 75}
 
 
-gdf_province = st.session_state["gdf_province"]
-gdf_bv = st.session_state["gdf_bv"]
-gdf_douars = st.session_state["gdf_douars"]
+def coverage_key(raw_values):
+    """(IAM, INWI, ORANGE) levels of a BV, unknown values as None."""
+    return tuple(v if v in COVERAGE_LEVELS else None for v in raw_values)
 
-st.title("🗺️ Map of Electoral offices")
 
-@st.cache_data
-def generate_bar_chart_html(row_data):
-    mapping = {"Faible": 25, "Moyenne": 50, "Bonne": 75}
+@st.cache_resource(show_spinner=False)
+def coverage_chart(key):
+    """Base64 PNG of the coverage chart of one level triple."""
     labels = ["IAM", "INWI", "ORANGE"]
-    raw_values = [
-        row_data.get("Couverture", "Faible"),
-        row_data.get("Couvertu_1", "Faible"),
-        row_data.get("Couvertu_2", "Faible")
-    ]
-    values = [mapping.get(v, 0) for v in raw_values]
+    values = [COVERAGE_LEVELS.get(v, 0) for v in key]
     colors = ["blue", "purple", "orange"]
 
     fig, ax = plt.subplots(figsize=(3, 2))
@@ -67,15 +68,15 @@ def generate_bar_chart_html(row_data):
 
     buf = BytesIO()
     plt.savefig(buf, format="png", bbox_inches='tight')
-    buf.seek(0)
-    img_base64 = base64.b64encode(buf.read()).decode("utf-8")
     plt.close(fig)
+    return base64.b64encode(buf.getvalue()).decode("utf-8")
 
-    return f'<img src="data:image/png;base64,{img_base64}" width="200">'
 
-# @st.cache_resource
-def create_map(_gdf_province_data):
-    m = folium.Map(location=[34.95, -3.39], zoom_start=9, control_scale=True)
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(1))
+def create_map(prov):
+    gdf_province = get_map_layer(prov, PROV_FIELDS)
+    prov_geojson = get_colored_geojson(prov, PROV_FIELDS, "BV")
+    m = folium.Map(location=layer_center("prov"), zoom_start=9, control_scale=True, prefer_canvas=True)
     
     # folium.TileLayer("OpenStreetMap", name="OpenStreetMap").add_to(m)
     folium.TileLayer("CartoDB positron", name="CartoDB Positron").add_to(m)
@@ -102,40 +103,10 @@ def create_map(_gdf_province_data):
     # Create ONE FeatureGroup for both the choropleth-like layer and its tooltip layer
     fg_province_combined = folium.FeatureGroup(name="Province").add_to(m)
 
-    # Ensure 'BV' column is numeric for colormap scaling
-    if not pd.api.types.is_numeric_dtype(_gdf_province_data['BV']):
-        _gdf_province_data['BV'] = pd.to_numeric(_gdf_province_data['BV'], errors='coerce')
-        _gdf_province_data.dropna(subset=['BV'], inplace=True) 
-
-    min_bv = _gdf_province_data['BV'].min()
-    max_bv = _gdf_province_data['BV'].max()
-    
-    ylorrd_colors = [
-        '#FFFFCC', '#FFEDA0', '#FED976', '#FEB24C', '#FD8D3C',
-        '#FC4E2A', '#E31A1C', '#BD0026', '#800026'
-    ]
+    min_bv = gdf_province['BV'].min()
+    max_bv = gdf_province['BV'].max()
     
-    if min_bv == max_bv:
-        colormap = LinearColormap([ylorrd_colors[0]], vmin=min_bv, vmax=max_bv, caption="BV Count by Commune")
-    else:
-        colormap = LinearColormap(ylorrd_colors, vmin=min_bv, vmax=max_bv, caption="BV Count by Commune")
-
-    def style_function_choropleth(feature):
-        bv_value = feature['properties']['BV']
-        return {
-            'fillColor': colormap(bv_value) if pd.notnull(bv_value) else '#cccccc',
-            'color': 'black',
-            'weight': 0.5,
-            'fillOpacity': 0.7
-        }
-
-    # Add the Choropleth-like GeoJson to the COMBINED FeatureGroup
-    folium.GeoJson(
-        _gdf_province_data.__geo_interface__,
-        style_function=style_function_choropleth,
-        highlight_function=lambda x: {'fillOpacity': 0.9},
-        name="Province - BV Count Visual" # This name will show up if you inspect individual layers, but the FG name controls LayerControl
-    ).add_to(fg_province_combined)
+    colormap = legend(min_bv, max_bv, "BV Count by Commune")
 
     # Add the colormap legend directly to the map
     colormap.add_to(m) # Colormap legend remains independent for clarity
@@ -157,84 +128,63 @@ def create_map(_gdf_province_data):
         max_width=800,
     )
     
-    # Add the Tooltip GeoJson to the *SAME* COMBINED FeatureGroup
-    folium.GeoJson(
-        _gdf_province_data,
-        style_function=lambda x: {
-            "fillOpacity": 0,
-            "color": "transparent", # Make the fill transparent so only the tooltip interacts
-            "weight": 0,
-        },
+    # Styled layer with its tooltip and highlight, in the combined FeatureGroup
+    choropleth_layer(
+        prov_geojson,
+        style_function=color_style(color="black", weight=0.5, fillOpacity=0.7),
         tooltip=tooltip_pv,
-        name="Province - Details Tooltip" # Name for internal reference, not for LayerControl directly
-    ).add_to(fg_province_combined) # Crucial: add to the combined FG
+        name="Province - BV Count Visual",
+    ).add_to(fg_province_combined)
 
     return m
 
 # st.subheader("🗺️ Thematic map")
 
 # --- Get the cached base map ---
-m = create_map(gdf_province)
+m = clone_map(create_map(layer_handle("prov")))
 
 # FeatureGroup for Bureau de vote (with clustering)
 fg_bv = folium.FeatureGroup(name="Bureaux de vote").add_to(m)
 cluster = MarkerCluster().add_to(fg_bv)
 
-# --- Pre-generate all bar chart HTMLs ---
-gdf_bv['bar_chart_html'] = gdf_bv.apply(generate_bar_chart_html, axis=1)
-
-for idx, row in gdf_bv.iterrows():
-    chart_html_for_popup = row['bar_chart_html']
-
-    popup_html = f"""
-    <div style="background-color:#f9f9f9; padding:8px; border-radius:6px; border:1px solid #ccc;">
-    <h4 style="margin-top:0; margin-bottom:8px;">Bureau de vote:</h4>
-    <table style="width:300px; font-size:13px;font-family: arial, sans-serif;">
-        <tr style="background-color: #dddddd;"><th align="left";border: 1px solid #dddddd; padding: 8px;>Bureau</th><td>{row['Nom_du__bu']}</td></tr>
-        <tr style="background-color: #dddddd;"><th align="left";border: 1px solid #dddddd; padding: 8px;>Commune</th><td>{row['Commune']}</td></tr>
-        <tr style="background-color: #dddddd;"><th align="left";border: 1px solid #dddddd; padding: 8px;>Province</th><td>{row['Province']}</td></tr>
-        <tr style="background-color: #dddddd;"><th align="left";border: 1px solid #dddddd; padding: 8px;>Machiakha</th><td>{row['Machiakha']}</td></tr>
-        <tr style="background-color: #dddddd;"><th align="left";border: 1px solid #dddddd; padding: 8px;>Type</th><td>{row['Type_de_li']}</td></tr>
-        <tr style="background-color: #dddddd;"><th align="left";border: 1px solid #dddddd; padding: 8px;>Sensibilité</th><td>{row['Sensibilit']}</td></tr>
-        <tr style="background-color: #dddddd;"><th align="left";border: 1px solid #dddddd; padding: 8px;>Accessibilité</th><td>{row['Accessibil']}</td></tr>
-        <tr style="background-color: #dddddd;"><th align="left";border: 1px solid #dddddd; padding: 8px;>Électrifié</th><td>{row['Électrifi']}</td></tr>
-    </table>
-    <br>
-    {chart_html_for_popup}
-    </div>
-    """
-
-    folium.Marker(
-        location=[row.geometry.y, row.geometry.x],
-        icon=folium.DivIcon(html=f"""
-            <div style="font-size:24px;">🗳️</div>
-        """),
-        tooltip="Bureau: "+str(row["Nom_du__bu"]),
-        popup=folium.Popup(popup_html, max_width=300)
-    ).add_to(cluster)
+bv_coverage = [coverage_key(values) for values in zip(*(gdf_bv[c] for c in COVERAGE_FIELDS))]
+
+# All BV in one GeoJSON layer
+point_layer(
+    get_point_geojson("bv", ["Nom_du__bu"]),
+    marker=folium.Marker(icon=folium.DivIcon(html='<div style="font-size:24px;">🗳️</div>')),
+    popup=False,
+    on_each_feature=row_tooltip("bv", "Nom_du__bu"),
+).add_to(cluster)
 
 # ➕ Add new layer: Douars (no clustering)
 fg_douars = folium.FeatureGroup(name="Douars").add_to(m)
-
-
-for idx, row in gdf_douars.iterrows():
-    popup_douars = f"""
-    <b>Douar:</b> {row['Douar']}<br>
-    <b>Milieu:</b> {row['Milieu']}<br>
-    <b>Population:</b> {row['Popul']}<br>
-    """    
-    folium.CircleMarker(
-        location=[row.geometry.y, row.geometry.x],
-        radius=5,
-        color="darkgreen",
-        fill=True,
-        fill_opacity=0.8,
-        tooltip=row['Douar'],
-        popup=folium.Popup(popup_douars, max_width=300)
-    ).add_to(fg_douars)
+point_layer(
+    douars_geojson,
+    marker=folium.CircleMarker(radius=5, color="darkgreen", fill=True, fill_opacity=0.8),
+    popup=False,
+    on_each_feature=row_tooltip("douars", "Douar"),
+).add_to(fg_douars)
 
 # Add LayerControl at the end
 folium.LayerControl(position='topright', collapsed=False).add_to(m)
 
 # --- Render map ---
-st_data = st_folium(m, width="100%", height=700)
\ No newline at end of file
+col_map, col_popup = st.columns([3, 1])
+with col_map:
+    st_data = st_folium(m, width="100%", height=700, returned_objects=["last_object_clicked_tooltip"])
+
+# --- Popup of the clicked BV or douar, from the cached popup arrays ---
+with col_popup:
+    clicked = (st_data or {}).get("last_object_clicked_tooltip")
+    bv_pos, douar_pos = clicked_row(clicked, "bv"), clicked_row(clicked, "douars")
+    if bv_pos is not None:
+        img_base64 = coverage_chart(bv_coverage[bv_pos])
+        st.markdown(
+            f'{bv_popups[bv_pos]}<br><img src="data:image/png;base64,{img_base64}" width="200">',
+            unsafe_allow_html=True,
+        )
+    elif douar_pos is not None:
+        st.markdown(douar_popups[douar_pos], unsafe_allow_html=True)
+    else:
+        st.info("Cliquez sur un bureau de vote ou un douar pour afficher ses détails.")
@@ -14,70 +14,33 @@ import matplotlib.pyplot as plt
 import base64
 from io import BytesIO
 from pathlib import Path
-from collections import defaultdict
+import numpy as np
 
 # ---------------------------
-# Paths + load (once per session)
+# Shared layers
 # ---------------------------
-base_path = Path(__file__).resolve().parent.parent  # client_portal/
-data_path = base_path.parent / "shared_data" / "geojson_files"
-
-# Communes with education stats
-if "gdf_educ_communes" not in st.session_state:
-    st.session_state["gdf_educ_communes"] = gpd.read_file(data_path / "educ_commune.geojson")
-
-# Schools points
-if "gdf_ecole" not in st.session_state:
-    st.session_state["gdf_ecole"] = gpd.read_file(data_path / "educ_tot.geojson")
-
-# Douars points
-if "gdf_douars" not in st.session_state:
-    st.session_state["gdf_douars"] = gpd.read_file(data_path / "douars.geojson")
-
-gdf_communes = st.session_state["gdf_educ_communes"]
-gdf_ecole = st.session_state["gdf_ecole"]
-gdf_douars = st.session_state["gdf_douars"]
+from utils.catalog import layer_center
+from utils.colors import legend
+from utils.load_once import cache_entries, layer_handle
+from utils.maps import choropleth_layer, clone_map, color_style, get_colored_geojson, get_geojson, get_map_layer
+from utils.points import TOOLTIP, get_point_geojson, point_layer
+from utils.popups import DOUAR_FIELDS
+
+gdf_communes = get_map_layer("educ_commune")  # Communes with education stats
+gdf_ecole = get_map_layer("educ_tot", ["Nature"])  # Schools points (categories)
+douars_geojson = get_point_geojson("douars", ["Douar"], DOUAR_FIELDS)  # Douars points, popups included
+
+# Schools popups (templated per category title, once per layer version)
+SCHOOL_FIELDS = [
+    ("Nom", "Nom_Etabli"), ("Secteur", "Secteur"), ("Nature", "Nature"), ("État du bâtiment", "Etat_Batim"),
+    ("Effectif actuel", "Effectif_A"), ("Taux de réuissite", "Taux reuis"), ("Taux d'abandon", "Taux abond"),
+    ("AEP", "AEP"), ("Assainissment", "Assainisse"),
+]
+OTHER_SCHOOL_FIELDS = [("Nom", "Nom_Etabli"), ("Nature", "Nature"), ("Catégorie", "Categorie")]
 
 st.title("🏫 Éducation ")
 from shapely.geometry import Point
 
-#Clean coordinates helper
-def clean_points_gdf(gdf: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
-    gdf = gdf.copy()
-
-    # Try to build geometry from lon/lat if geometry is missing
-    if "Coord_Lon" in gdf.columns and "Coord_Lat" in gdf.columns:
-        missing = gdf["geometry"].isna()
-        if missing.any():
-            # Only create points for rows that have both lon/lat
-            have_xy = missing & gdf["Coord_Lon"].notna() & gdf["Coord_Lat"].notna()
-            gdf.loc[have_xy, "geometry"] = gpd.points_from_xy(
-                gdf.loc[have_xy, "Coord_Lon"],
-                gdf.loc[have_xy, "Coord_Lat"],
-                crs="EPSG:4326",
-            )
-
-    # Drop any rows that still have no geometry
-    gdf = gdf[~gdf["geometry"].isna()].copy()
-
-    # Keep only Point geometries
-    if "geometry" in gdf:
-        gdf = gdf[gdf.geometry.geom_type == "Point"].copy()
-
-    # Ensure WGS84 for folium
-    try:
-        if gdf.crs is None:
-            gdf.set_crs(epsg=4326, inplace=True)
-        elif gdf.crs.to_epsg() != 4326:
-            gdf = gdf.to_crs(epsg=4326)
-    except Exception:
-        # If CRS info is broken, force-set to WGS84 to avoid folium errors
-        gdf.set_crs(epsg=4326, inplace=True)
-
-    return gdf
-
-gdf_ecole = clean_points_gdf(gdf_ecole)
-
 # ---------------------------
 # Column aliasing (robust to variants)
 # ---------------------------
@@ -122,20 +85,20 @@ metric_actual = available_metrics.get(metric_canonical)
 # Choropleth colormap helper
 # ---------------------------
 def colormap_for_series(s: pd.Series) -> LinearColormap:
-    s = pd.to_numeric(s, errors="coerce").dropna()
+    s = s.dropna()
     if s.empty:
         return LinearColormap(["#dddddd", "#999999"], vmin=0, vmax=1, caption="No data")
-    vmin, vmax = float(s.min()), float(s.max())
-    ylorrd = ['#FFFFCC', '#FFEDA0', '#FED976', '#FEB24C', '#FD8D3C', '#FC4E2A', '#E31A1C', '#BD0026', '#800026']
-    if vmin == vmax:
-        return LinearColormap([ylorrd[0]], vmin=vmin, vmax=vmax, caption=f"{metric_canonical} par commune")
-    return LinearColormap(ylorrd, vmin=vmin, vmax=vmax, caption=f"{metric_canonical} par commune")
+    return legend(float(s.min()), float(s.max()), f"{metric_canonical} par commune")
 
 # ---------------------------
 # Map factory
 # ---------------------------
-def create_map(_gdf_communes: gpd.GeoDataFrame):
-    m = folium.Map(location=[34.95, -3.39], zoom_start=9, control_scale=True)
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(len(available_metrics) + 1))
+def create_map(communes, metric_actual, metric_canonical):
+    # Base map of one (layer version, metric)
+    gdf_communes = get_map_layer(communes)
+    communes_geojson = get_colored_geojson(communes, None, metric_actual) if metric_actual else get_geojson(communes)
+    m = folium.Map(location=layer_center("educ_commune"), zoom_start=9, control_scale=True, prefer_canvas=True)
 
     # Basemaps
     folium.TileLayer("CartoDB positron", name="CartoDB Positron").add_to(m)
@@ -156,39 +119,22 @@ def create_map(_gdf_communes: gpd.GeoDataFrame):
     fg_communes = folium.FeatureGroup(name="Communes (éducation)").add_to(m)
 
     if metric_actual:
-        _gdf_communes[metric_actual] = pd.to_numeric(_gdf_communes[metric_actual], errors="coerce")
-        cmap = colormap_for_series(_gdf_communes[metric_actual])
-
-        def style_fn(feat):
-            val = feat["properties"].get(metric_actual)
-            return {
-                "fillColor": cmap(val) if pd.notnull(val) else "#cccccc",
-                "color": "black",
-                "weight": 0.5,
-                "fillOpacity": 0.7,
-            }
-
-        folium.GeoJson(
-            _gdf_communes.__geo_interface__,
-            style_function=style_fn,
-            highlight_function=lambda x: {"fillOpacity": 0.9},
-            name=f"Choropleth - {metric_canonical}",
-        ).add_to(fg_communes)
-
-        cmap.add_to(m)
+        style_fn = color_style(color="black", weight=0.5, fillOpacity=0.7)
+        colormap_for_series(gdf_communes[metric_actual]).add_to(m)
     else:
-        st.warning("Aucune métrique sélectionnée/disponible pour la carte choroplèthe.")
+        def style_fn(feat):
+            return {"fillOpacity": 0, "color": "transparent", "weight": 0}
 
     # Tooltip for communes
     tooltip_fields, tooltip_aliases = [], []
     for canon in ["Nombre d'éleves en primaire", "Nombre d'éleves en collège", "Nombre d'éleves en lycée", " Nombre des écoles primaires", "Nombre des écoles satellite", "nombre de Collèges", "Nombre de Lycée", "Nombre d'internats"]:
         actual = actual_col_by_canonical.get(canon)
-        if actual and actual in _gdf_communes.columns:
+        if actual and actual in gdf_communes.columns:
             tooltip_fields.append(actual)
             tooltip_aliases.append(canon)
 
     for base_field, label in [("province_f", "Province"), ("commune_fr", "Commune")]:
-        if base_field in _gdf_communes.columns and base_field not in tooltip_fields:
+        if base_field in gdf_communes.columns and base_field not in tooltip_fields:
             tooltip_fields.insert(0, base_field)
             tooltip_aliases.insert(0, label)
 
@@ -207,17 +153,20 @@ def create_map(_gdf_communes: gpd.GeoDataFrame):
         max_width=800,
     )
 
-    folium.GeoJson(
-        _gdf_communes,
-        style_function=lambda x: {"fillOpacity": 0, "color": "transparent", "weight": 0},
+    # Styled layer with its tooltip and highlight
+    choropleth_layer(
+        communes_geojson,
+        style_function=style_fn,
         tooltip=tooltip,
-        name="Détails communes",
+        name=f"Choropleth - {metric_canonical}" if metric_actual else "Détails communes",
     ).add_to(fg_communes)
 
     return m
 
 # Create map
-m = create_map(gdf_communes)
+if not metric_actual:
+    st.warning("Aucune métrique sélectionnée/disponible pour la carte choroplèthe.")
+m = clone_map(create_map(layer_handle("educ_commune"), metric_actual, metric_canonical))
 
 # ---------------------------
 # Schools by Nature → separate layers + clusters + icons
@@ -240,94 +189,49 @@ CATEGORY_CONFIG = {
 }
 
 
-# 2) Bucket rows by normalized Nature
-def norm_nature(val) -> str:
-    if val is None:
-        return ""
-    return str(val).strip().upper()
-
-groups = defaultdict(list)
-for _, row in gdf_ecole.iterrows():
-    # groups[norm_nature(row.get("Nature"))].append(row)
-    groups[norm_nature(row.get("Nature"))].append(row)
+# 2) Normalized Nature of every school (vectorized)
+nature = gdf_ecole["Nature"].astype("string").str.strip().str.upper().fillna("").to_numpy()
 
 # 3) Build a FeatureGroup + MarkerCluster per known category
 for nature_key, cfg in CATEGORY_CONFIG.items():
-    rows = groups.get(nature_key, [])
-    if not rows:
+    in_cat = nature == nature_key
+    if not in_cat.any():
         continue
 
     fg_label = cfg["label"]
     fg_cat = folium.FeatureGroup(name=fg_label).add_to(m)
     clus = MarkerCluster().add_to(fg_cat)
 
-    for row in rows:
-        popup_html = f"""
-        <div style="background-color:#f9f9f9; padding:8px; border-radius:6px; border:1px solid #ccc;">
-          <h4 style="margin-top:0; margin-bottom:8px;">{fg_label}</h4>
-          <table style="width:300px; font-size:13px; font-family: arial, sans-serif;">
-            <tr style="background-color:#dddddd;"><th align="left">Nom</th><td>{row.get('Nom_Etabli','')}</td></tr>
-            <tr style="background-color:#dddddd;"><th align="left">Secteur</th><td>{row.get('Secteur','')}</td></tr>
-            <tr style="background-color:#dddddd;"><th align="left">Nature</th><td>{row.get('Nature','')}</td></tr>
-            <tr style="background-color:#dddddd;"><th align="left">État du bâtiment</th><td>{row.get('Etat_Batim','')}</td></tr>
-            <tr style="background-color:#dddddd;"><th align="left">Effectif actuel</th><td>{row.get('Effectif_A','')}</td></tr>
-            <tr style="background-color:#dddddd;"><th align="left">Taux de réuissite</th><td>{row.get('Taux reuis','')}</td></tr>
-            <tr style="background-color:#dddddd;"><th align="left">Taux d'abandon</th><td>{row.get('Taux abond','')}</td></tr>
-            <tr style="background-color:#dddddd;"><th align="left">AEP</th><td>{row.get('AEP','')}</td></tr>
-            <tr style="background-color:#dddddd;"><th align="left">Assainissment</th><td>{row.get('Assainisse','')}</td></tr>
-          </table>
-        </div>
-        """
-        folium.Marker(
-            location=[row.geometry.y, row.geometry.x],
-            icon=folium.DivIcon(html=f'<div style="font-size:{cfg["size_px"]}px;">{cfg["emoji"]}</div>'),
-            tooltip=f"{fg_label}: {row.get('Nom_Etabli','')}",
-            popup=folium.Popup(popup_html, max_width=320),
-        ).add_to(clus)
+    point_layer(
+        get_point_geojson("educ_tot", [], SCHOOL_FIELDS, fg_label, rows=np.flatnonzero(in_cat).tolist(),
+                          tooltip=fg_label + ": {Nom_Etabli}"),
+        marker=folium.Marker(icon=folium.DivIcon(html=f'<div style="font-size:{cfg["size_px"]}px;">{cfg["emoji"]}</div>')),
+        tooltip_field=TOOLTIP,
+        max_width=320,
+    ).add_to(clus)
 
 # 4) Unknown / other Nature values → one extra group (optional)
-other_keys = [k for k in groups.keys() if k and k not in CATEGORY_CONFIG]
-if other_keys:
+other = (nature != "") & ~np.isin(nature, list(CATEGORY_CONFIG))
+if other.any():
     fg_other = folium.FeatureGroup(name="Autres établissements").add_to(m)
     clus_other = MarkerCluster().add_to(fg_other)
-    for k in other_keys:
-        for row in groups[k]:
-            popup_html = f"""
-            <div style="background-color:#f9f9f9; padding:8px; border-radius:6px; border:1px solid #ccc;">
-              <h4 style="margin-top:0; margin-bottom:8px;">Autre établissement</h4>
-              <table style="width:300px; font-size:13px; font-family: arial, sans-serif;">
-                <tr style="background-color:#dddddd;"><th align="left">Nom</th><td>{row.get('Nom_Etabli','')}</td></tr>
-                <tr style="background-color:#dddddd;"><th align="left">Nature</th><td>{row.get('Nature','')}</td></tr>
-                <tr style="background-color:#dddddd;"><th align="left">Catégorie</th><td>{row.get('Categorie','')}</td></tr>
-              </table>
-            </div>
-            """
-            folium.Marker(
-                location=[row.geometry.y, row.geometry.x],
-                icon=folium.DivIcon(html='<div style="font-size:20px;">🏢</div>'),
-                tooltip=f"{row.get('Nature','')}: {row.get('Nom_Etabli','')}",
-                popup=folium.Popup(popup_html, max_width=320),
-            ).add_to(clus_other)
+    point_layer(
+        get_point_geojson("educ_tot", [], OTHER_SCHOOL_FIELDS, "Autre établissement",
+                          rows=np.flatnonzero(other).tolist(), tooltip="{Nature}: {Nom_Etabli}"),
+        marker=folium.Marker(icon=folium.DivIcon(html='<div style="font-size:20px;">🏢</div>')),
+        tooltip_field=TOOLTIP,
+        max_width=320,
+    ).add_to(clus_other)
 
 # ---------------------------
 # Douars (no clustering)
 # ---------------------------
 fg_douars = folium.FeatureGroup(name="Douars").add_to(m)
-for _, row in gdf_douars.iterrows():
-    popup_d = f"""
-    <b>Douar:</b> {row.get('Douar','')}<br>
-    <b>Milieu:</b> {row.get('Milieu','')}<br>
-    <b>Population:</b> {row.get('Popul','')}<br>
-    """
-    folium.CircleMarker(
-        location=[row.geometry.y, row.geometry.x],
-        radius=5,
-        color="grey",
-        fill=True,
-        fill_opacity=0.8,
-        tooltip=row.get('Douar',''),
-        popup=folium.Popup(popup_d, max_width=300),
-    ).add_to(fg_douars)
+point_layer(
+    douars_geojson,
+    marker=folium.CircleMarker(radius=5, color="grey", fill=True, fill_opacity=0.8),
+    tooltip_field="Douar",
+).add_to(fg_douars)
 
 # Layer control
 folium.LayerControl(position="topright", collapsed=False).add_to(m)
@@ -6,33 +6,35 @@ from folium.plugins import MarkerCluster
 from streamlit_folium import st_folium
 from folium import plugins as fp
 from folium.features import GeoJsonTooltip
-from branca.colormap import LinearColormap
 from pathlib import Path
 
 # --- Load data ---
-base_path = Path(__file__).resolve().parent.parent  # client_portal/
-data_path = base_path.parent / "shared_data" / "geojson_files"
-
-if "gdf_province" not in st.session_state:
-    st.session_state["gdf_province"] = gpd.read_file(data_path / "prov.geojson")
-
-if "gdf_route" not in st.session_state:
-    st.session_state["gdf_route"] = gpd.read_file(data_path / "res_routier.geojson")
-
-if "gdf_douars" not in st.session_state:
-    st.session_state["gdf_douars"] = gpd.read_file(data_path / "douars.geojson")
-
-
-
-gdf_douars = st.session_state["gdf_douars"]
-gdf_province = st.session_state["gdf_province"]
-gdf_route = st.session_state["gdf_route"]
+from utils.catalog import layer_center
+from utils.lines import zoomed_lines
+from utils.load_once import cache_entries, layer_handle
+from utils.colors import legend
+from utils.maps import choropleth_layer, clone_map, color_style, get_colored_geojson, get_map_layer
+from utils.points import get_point_geojson, point_layer
+from utils.popups import DOUAR_FIELDS
+
+# Only the attributes shown in tooltips/popups are read
+douars_geojson = get_point_geojson("douars", ["Douar"], DOUAR_FIELDS)  # one layer, popups included
+PROV_FIELDS = ["region_fr", "province_f", "cercle_fr", "commune_fr", "milieu", "Population", "superficie", "Voirier_Q"]
+ROUTE_FIELDS = (("Nom", "nom_fr"), ("Commune", "commune"), ("Cercle", "cercle_fr"), ("Milieu", "milieu"), ("État", "etat"))
+ROUTE_COLORS = {"Goudronnée": "black", "Piste": "DarkGray"}  # by etat, others gray
+
+if layer_handle("res_routier") is None:
+    st.error("Couche introuvable : `shared_data/geojson_files/res_routier.geojson`.")
+    st.stop()
 
 st.title("🛣️ Carte du Réseau Routier")
 
 # Create the folium map
-def create_map(_gdf_province_data):
-    m = folium.Map(location=[34.95, -3.39], zoom_start=9, control_scale=True)
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(1))
+def create_map(prov, routes):
+    gdf_province = get_map_layer(prov, PROV_FIELDS)
+    prov_geojson = get_colored_geojson(prov, PROV_FIELDS, "Voirier_Q")
+    m = folium.Map(location=layer_center("prov"), zoom_start=9, control_scale=True, prefer_canvas=True)
 
     folium.TileLayer("CartoDB positron", name="CartoDB Positron").add_to(m)
     folium.TileLayer(
@@ -54,38 +56,10 @@ def create_map(_gdf_province_data):
 
     fg_province_combined = folium.FeatureGroup(name="Province").add_to(m)
 
-    if not pd.api.types.is_numeric_dtype(_gdf_province_data['Voirier_Q']):
-        _gdf_province_data['Voirier_Q'] = pd.to_numeric(_gdf_province_data['Voirier_Q'], errors='coerce')
-        _gdf_province_data.dropna(subset=['Voirier_Q'], inplace=True)
-
-    min_Voirier_Q = _gdf_province_data['Voirier_Q'].min()
-    max_Voirier_Q = _gdf_province_data['Voirier_Q'].max()
-
-    ylorrd_colors = [
-        '#FFFFCC', '#FFEDA0', '#FED976', '#FEB24C', '#FD8D3C',
-        '#FC4E2A', '#E31A1C', '#BD0026', '#800026'
-    ]
-
-    if min_Voirier_Q == max_Voirier_Q:
-        colormap = LinearColormap([ylorrd_colors[0]], vmin=min_Voirier_Q, vmax=max_Voirier_Q, caption="Roads quality by Commune")
-    else:
-        colormap = LinearColormap(ylorrd_colors, vmin=min_Voirier_Q, vmax=max_Voirier_Q, caption="Roads quality by Commune")
-
-    def style_function_choropleth(feature):
-        Voirier_Q_value = feature['properties']['Voirier_Q']
-        return {
-            'fillColor': colormap(Voirier_Q_value) if pd.notnull(Voirier_Q_value) else '#cccccc',
-            'color': 'black',
-            'weight': 0.5,
-            'fillOpacity': 0.7
-        }
-
-    folium.GeoJson(
-        _gdf_province_data.__geo_interface__,
-        style_function=style_function_choropleth,
-        highlight_function=lambda x: {'fillOpacity': 0.9},
-        name="Province - Roads quality Visual"
-    ).add_to(fg_province_combined)
+    min_Voirier_Q = gdf_province['Voirier_Q'].min()
+    max_Voirier_Q = gdf_province['Voirier_Q'].max()
+
+    colormap = legend(min_Voirier_Q, max_Voirier_Q, "Roads quality by Commune")
 
     colormap.add_to(m)
 
@@ -104,74 +78,34 @@ def create_map(_gdf_province_data):
         max_width=800,
     )
 
-    folium.GeoJson(
-        _gdf_province_data,
-        style_function=lambda x: {
-            "fillOpacity": 0,
-            "color": "transparent",
-            "weight": 0,
-        },
+    # Styled layer with its tooltip and highlight, in the combined FeatureGroup
+    choropleth_layer(
+        prov_geojson,
+        style_function=color_style(color="black", weight=0.5, fillOpacity=0.7),
         tooltip=tooltip_pv,
-        name="Province - Details Tooltip"
+        name="Province - Roads quality Visual",
     ).add_to(fg_province_combined)
 
+    # Road network, coloured by etat and finer as the user zooms in
+    fg_routes = folium.FeatureGroup(name="Réseau Routier").add_to(m)
+    zoomed_lines(fg_routes, routes, ["nom_fr"], ROUTE_FIELDS, color_by="etat", colors=ROUTE_COLORS,
+                 tooltip_field="nom_fr")
+
     return m
 
 # --- Create base map ---
-m = create_map(gdf_province)
-
-# --- Add Route Layer ---
-fg_routes = folium.FeatureGroup(name="Réseau Routier").add_to(m)
-
-def get_route_color(etat):
-    return {
-        "Goudronnée": "black",
-        "Piste": "DarkGray"
-    }.get(etat, "gray")
-
-for _, row in gdf_route.iterrows():
-    etat = row.get("etat", "")
-    props = row.to_dict()
-
-    popup_content = f"""
-    <b>Nom:</b> {props.get('nom_fr', '')}<br>
-    <b>Commune:</b> {props.get('commune', '')}<br>
-    <b>Cercle:</b> {props.get('cercle_fr', '')}<br>
-    <b>Milieu:</b> {props.get('milieu', '')}<br>
-    <b>État:</b> {props.get('etat', '')}<br>
-    """
-
-    multiline = row.geometry
-    if multiline.geom_type == "MultiLineString":
-        for line in multiline.geoms:
-            folium.PolyLine(
-                locations=[(pt[1], pt[0]) for pt in line.coords],
-                color=get_route_color(etat),
-                weight=3,
-                popup=folium.Popup(popup_content, max_width=300),
-                tooltip=props.get("nom_fr", "Route")
-            ).add_to(fg_routes)
+m = clone_map(create_map(layer_handle("prov"), layer_handle("res_routier")))
 
 
 # ➕ Add new layer: Douars (no clustering)
 fg_douars = folium.FeatureGroup(name="Douars").add_to(m)
 
 
-for idx, row in gdf_douars.iterrows():
-    popup_douars = f"""
-    <b>Douar:</b> {row['Douar']}<br>
-    <b>Milieu:</b> {row['Milieu']}<br>
-    <b>Population:</b> {row['Popul']}<br>
-    """    
-    folium.CircleMarker(
-        location=[row.geometry.y, row.geometry.x],
-        radius=5,
-        color="darkgreen",
-        fill=True,
-        fill_opacity=0.8,
-        tooltip=row['Douar'],
-        popup=folium.Popup(popup_douars, max_width=300)
-    ).add_to(fg_douars)
+point_layer(
+    douars_geojson,
+    marker=folium.CircleMarker(radius=5, color="darkgreen", fill=True, fill_opacity=0.8),
+    tooltip_field="Douar",
+).add_to(fg_douars)
 
 
 
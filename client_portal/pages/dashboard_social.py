@@ -5,21 +5,17 @@ import folium
 from streamlit_folium import st_folium
 from folium import plugins as fp
 from folium.features import GeoJsonTooltip
-from branca.colormap import LinearColormap
 from pathlib import Path
 
 # --- Load data ---
-base_path = Path(__file__).resolve().parent.parent  # client_portal/
-data_path = base_path.parent / "shared_data" / "geojson_files"
+from utils.catalog import layer_center
+from utils.load_once import cache_entries, layer_handle
+from utils.colors import YLGNBU, legend
+from utils.maps import choropleth_layer, clone_map, color_style, get_colored_geojson, get_map_layer
+from utils.points import get_point_geojson, point_layer
+from utils.popups import DOUAR_FIELDS
 
-if "gdf_social" not in st.session_state:
-    st.session_state["gdf_social"] = gpd.read_file(data_path / "sociale_communes.geojson")
-
-if "gdf_douars" not in st.session_state:
-    st.session_state["gdf_douars"] = gpd.read_file(data_path / "douars.geojson")
-
-gdf_social = st.session_state["gdf_social"]
-gdf_douars = st.session_state["gdf_douars"]
+# Layers are read in create_map(), once per layer version and chosen index
 
 st.title("🗺️ Indices Sociaux")
 
@@ -28,8 +24,14 @@ theme_options = ["Population", "Menages", "Scolarisat", "analphabé", "Masculin"
 selected_theme = st.selectbox("Choisir un indice social", theme_options)
 
 # --- Fonction carte ---
-def create_map(gdf, theme):
-    m = folium.Map(location=[34.95, -3.39], zoom_start=9, control_scale=True)
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(len(theme_options)))
+def create_map(social, douars, theme):
+    # One map per (layer versions, theme)
+    fields = ["province_f", "commune_fr", theme]
+    gdf = get_map_layer(social, fields)
+    geojson = get_colored_geojson(social, fields, theme, YLGNBU)
+    douars_geojson = get_point_geojson(douars, ["Douar"], DOUAR_FIELDS)
+    m = folium.Map(location=layer_center("sociale_communes"), zoom_start=9, control_scale=True, prefer_canvas=True)
     
     folium.TileLayer("CartoDB positron", name="CartoDB Positron").add_to(m)
     folium.TileLayer("OpenStreetMap", name="OSM").add_to(m)
@@ -42,26 +44,8 @@ def create_map(gdf, theme):
     ).add_to(m)
     fp.Fullscreen().add_to(m)
 
-    # Assurer type numérique
-    if not pd.api.types.is_numeric_dtype(gdf[theme]):
-        gdf[theme] = pd.to_numeric(gdf[theme], errors="coerce")
-        gdf.dropna(subset=[theme], inplace=True)
-
     min_val, max_val = gdf[theme].min(), gdf[theme].max()
-    colormap = LinearColormap(
-        colors=['#ffffcc','#a1dab4','#41b6c4','#2c7fb8','#253494'],
-        vmin=min_val, vmax=max_val,
-        caption=f"{theme} par commune"
-    )
-
-    def style_function(feature):
-        value = feature["properties"].get(theme, None)
-        return {
-            "fillColor": colormap(value) if value is not None else "#cccccc",
-            "color": "black",
-            "weight": 0.5,
-            "fillOpacity": 0.7
-        }
+    colormap = legend(min_val, max_val, f"{theme} par commune", YLGNBU)
 
     tooltip = GeoJsonTooltip(
         fields=["province_f","commune_fr", theme],
@@ -72,9 +56,9 @@ def create_map(gdf, theme):
         style="background-color:#F0EFEF; border:1px solid black; border-radius:3px; padding:3px;",
     )
 
-    folium.GeoJson(
-        gdf,
-        style_function=style_function,
+    choropleth_layer(
+        geojson,
+        style_function=color_style(color="black", weight=0.5, fillOpacity=0.7),
         tooltip=tooltip,
         name="Communes Sociales"
     ).add_to(m)
@@ -83,22 +67,15 @@ def create_map(gdf, theme):
 
     # Ajouter Douars
     fg_douars = folium.FeatureGroup(name="Douars").add_to(m)
-    for _, row in gdf_douars.iterrows():
-        popup_douar = f"""
-        <b>Douar:</b> {row['Douar']}<br>
-        <b>Milieu:</b> {row['Milieu']}<br>
-        <b>Population:</b> {row['Popul']}<br>
-        """
-        folium.CircleMarker(
-            location=[row.geometry.y, row.geometry.x],
-            radius=5, color="darkred", fill=True, fill_opacity=0.7,
-            tooltip=row["Douar"],
-            popup=popup_douar
-        ).add_to(fg_douars)
+    point_layer(
+        douars_geojson,
+        marker=folium.CircleMarker(radius=5, color="darkred", fill=True, fill_opacity=0.7),
+        tooltip_field="Douar",
+    ).add_to(fg_douars)
 
     folium.LayerControl().add_to(m)
     return m
 
 # --- Render ---
-m = create_map(gdf_social, selected_theme)
+m = clone_map(create_map(layer_handle("sociale_communes"), layer_handle("douars"), selected_theme))
 st_data = st_folium(m, width="100%", height=700)
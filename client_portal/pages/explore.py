@@ -13,58 +13,29 @@ if "auth" not in st.session_state or not st.session_state["auth"]:
     switch_page("app.py")
     st.stop()
 
-# --- Load once (uses your existing loader if present) ---
-try:
-    from utils.load_once import load_data_once
-    load_data_once()
-except Exception:
-    # If missing, we’ll still try reading files directly below.
-    pass
-
-BASE = Path(__file__).resolve().parent.parent    # client_portal/
-DATA_DIR = BASE.parent / "shared_data" / "geojson_files"
-
-# Map human names -> (session key, filename)
-CANDIDATES = {
-    "Communes (Province)": ("gdf_province", "prov.geojson"),
-    "Bureaux de vote (BV)": ("gdf_bv", "bv.geojson"),
-    "Douars": ("gdf_douars", "douars.geojson"),
-    "Réseau routier": ("gdf_routes", "res_routier.geojson"),
-    "Éducation - Communes": ("gdf_educ_communes", "educ_commune.geojson"),
-    "Établissements scolaires": ("gdf_ecole", "educ_tot.geojson"),  # change if different
-    "Indices sociaux - Communes": ("gdf_social", "sociale_communes.geojson"),
-}
-
-# Try to ensure each dataset is available (prefer session_state, else read file if present)
-available = {}
-for label, (ss_key, fname) in CANDIDATES.items():
-    if ss_key in st.session_state and isinstance(st.session_state[ss_key], gpd.GeoDataFrame):
-        available[label] = st.session_state[ss_key]
-        continue
-    fpath = DATA_DIR / fname
-    if fpath.exists():
-        try:
-            gdf = gpd.read_file(fpath)
-            st.session_state[ss_key] = gdf
-            available[label] = gdf
-        except Exception:
-            # Skip silently if unreadable
-            pass
+# --- Dataset catalog (built at ingest; nothing is loaded to list the datasets) ---
+from utils.catalog import get_catalog
+from utils.load_once import get_layer
+
+catalog = get_catalog()
 
 st.title("📊 Explore Data")
 
-if not available:
+if not catalog:
     st.error("Aucune couche disponible. Vérifie le dossier `shared_data/geojson_files` ou le chargement initial.")
     st.stop()
 
 # --- Pick dataset ---
-dataset_label = st.selectbox("Choisir le jeu de données :", list(available.keys()))
-gdf = available[dataset_label]
+labels = {entry["label"]: name for name, entry in catalog.items()}
+dataset_label = st.selectbox("Choisir le jeu de données :", list(labels))
+entry = catalog[labels[dataset_label]]
 
 # --- Basic info ---
 st.markdown(f"**Jeu de données sélectionné :** {dataset_label}")
-st.write(f"**Nombre d'entités :** {len(gdf):,}")
-st.write("**Colonnes :**", list(gdf.columns))
+st.write(f"**Nombre d'entités :** {entry['features']:,}")
+st.write("**Colonnes :**", list(entry["columns"]))
+
+gdf = get_layer(entry["name"])
 
 # Work on non-geometry for table/chart
 df = gdf.drop(columns="geometry", errors="ignore").copy()
@@ -2,30 +2,23 @@ import streamlit as st
 import pandas as pd
 import geopandas as gpd
 
-# --- Optional: load data once (safe if already loaded elsewhere) ---
-try:
-    from utils.load_once import load_data_once
-    load_data_once()
-except Exception:
-    # If your app loads data in app.py, it's fine to skip here.
-    pass
+# --- Dataset catalog (built at ingest) + shared layer registry ---
+from utils.catalog import get_catalog
+from utils.load_once import get_layer
 
 st.title("🔍 Recherche interactive")
 
-# ---- Collect all GeoDataFrames present in session_state ----
-gdf_candidates = {
-    k: v for k, v in st.session_state.items() if isinstance(v, gpd.GeoDataFrame)
-}
+# ---- Every layer listed in the catalog (only the chosen one is loaded) ----
+catalog = get_catalog()
 
-if not gdf_candidates:
-    st.error("Aucun jeu de données trouvé dans la session. Assurez-vous d'avoir chargé les GeoDataFrames (ex: via app.py / load_once).")
+if not catalog:
+    st.error("Aucun jeu de données trouvé. Vérifie le dossier `shared_data/geojson_files`.")
     st.stop()
 
 # Nice names for the selector
-pretty_names = {k: k.replace("gdf_", "").replace("_", " ").title() for k in gdf_candidates}
-name_to_key = {pretty_names[k]: k for k in gdf_candidates}
-dataset_label = st.selectbox("Choisissez un jeu de données :", sorted(pretty_names.values()))
-gdf = gdf_candidates[name_to_key[dataset_label]]
+name_to_key = {entry["label"]: k for k, entry in catalog.items()}
+dataset_label = st.selectbox("Choisissez un jeu de données :", sorted(name_to_key))
+gdf = get_layer(name_to_key[dataset_label])
 
 # Work on a Pandas DataFrame (without geometry)
 df_base = gdf.drop(columns="geometry", errors="ignore").copy()
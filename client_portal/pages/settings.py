@@ -1,4 +1,11 @@
 import streamlit as st
 st.title('⚙️ Settings Page')
 
-st.markdown('<link href="styles.css" rel="stylesheet">', unsafe_allow_html=True)
\ No newline at end of file
+st.markdown('<link href="styles.css" rel="stylesheet">', unsafe_allow_html=True)
+
+
+# --- Data loading ---
+from utils.load_once import load_report
+
+st.subheader("📦 Chargement des données")
+st.dataframe(load_report(), hide_index=True)
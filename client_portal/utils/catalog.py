@@ -0,0 +1,116 @@
+"""
+Dataset catalog: one manifest (shared_data/catalog.json, written by utils/ingest.py)
+describing every layer — schema and dtypes, feature count, bbox, geometry type and
+content hash — so pages can list datasets, size widgets and centre maps without
+loading or scanning the data.
+"""
+import json
+from types import MappingProxyType
+
+import streamlit as st
+
+from utils.load_once import (
+    LAYERS, cache_entries, catalog_path, data_path, fresh, get_layer, layer_file, layer_handle, replacing,
+    source_digest,
+)
+from utils.normalize import usable_geometry
+
+DEFAULT_CENTER = [34.95, -3.39]  # Driouch, when a layer has no usable bbox
+
+# Human names shown in the dataset selectors (others fall back to their layer name)
+LABELS = {
+    "prov": "Communes (Province)",
+    "bv": "Bureaux de vote (BV)",
+    "douars": "Douars",
+    "res_routier": "Réseau routier",
+    "educ_commune": "Éducation - Communes",
+    "educ_tot": "Établissements scolaires",
+    "sociale_communes": "Indices sociaux - Communes",
+}
+
+
+def layer_label(name):
+    """Human name of a layer ("pacha_midar_puits" -> "Pacha Midar Puits" by default)."""
+    return LABELS.get(name, name.replace("_", " ").title())
+
+
+def _bbox(geometry):
+    # Lon/lat bounds, ignoring empty geometries and junk coordinates
+    b = geometry.bounds.to_numpy()[usable_geometry(geometry)]
+    if not len(b):
+        return None
+    return [float(b[:, 0].min()), float(b[:, 1].min()), float(b[:, 2].max()), float(b[:, 3].max())]
+
+
+def describe_layer(name, gdf):
+    """Catalog entry of a loaded layer."""
+    src = data_path / LAYERS[name]
+    geom_types = sorted(gdf.geometry.geom_type.dropna().unique().tolist())
+    return {
+        "name": name,
+        "label": layer_label(name),
+        "file": LAYERS[name],
+        "sha1": source_digest(src) if src.exists() else None,
+        "features": len(gdf),
+        "geometry_type": geom_types[0] if len(geom_types) == 1 else ("Mixed" if geom_types else None),
+        "bbox": _bbox(gdf.geometry),
+        "crs": gdf.crs.to_string() if gdf.crs is not None else None,
+        "columns": {col: str(dtype) for col, dtype in gdf.dtypes.items() if col != gdf.geometry.name},
+    }
+
+
+def write_catalog(entries):
+    """Write shared_data/catalog.json from a list of describe_layer() entries."""
+    with replacing(catalog_path) as tmp:
+        tmp.write_text(json.dumps({e["name"]: e for e in entries}, ensure_ascii=False, indent=1), encoding="utf-8")
+    return catalog_path
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(1))
+def _read_catalog(mtime_ns):
+    # Keyed by mtime so a rebuilt manifest is read again
+    return json.loads(catalog_path.read_text(encoding="utf-8"))
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(len(LAYERS)))
+def _described(handle):
+    # Fallback for layers the manifest does not cover (yet): described once per version
+    return describe_layer(handle.name, get_layer(handle))
+
+
+def catalog_entry(name):
+    """Catalog entry of a layer (None if its file is missing)."""
+    if layer_file(name) is None:
+        return None
+    manifest = _read_catalog(catalog_path.stat().st_mtime_ns) if catalog_path.exists() else {}
+    if name in manifest and fresh(manifest[name].get("sha1"), data_path / LAYERS[name]):
+        return manifest[name]
+    return _described(layer_handle(name))
+
+
+def get_catalog():
+    """Read-only mapping name -> catalog entry of every layer present on disk."""
+    entries = {}
+    for name in LAYERS:
+        entry = catalog_entry(name)
+        if entry is not None:
+            entries[name] = entry
+    return MappingProxyType(entries)
+
+
+def layer_bounds(name):
+    """[[south, west], [north, east]] of a layer, for folium's fit_bounds (None if unknown)."""
+    entry = catalog_entry(name)
+    if entry is None or entry["bbox"] is None:
+        return None
+    minx, miny, maxx, maxy = entry["bbox"]
+    return [[miny, minx], [maxy, maxx]]
+
+
+def layer_center(name):
+    """[lat, lon] centre of a layer's bbox (DEFAULT_CENTER if unknown)."""
+    bounds = layer_bounds(name)
+    if bounds is None:
+        return DEFAULT_CENTER
+    (south, west), (north, east) = bounds
+    return [(south + north) / 2, (west + east) / 2]
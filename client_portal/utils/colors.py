@@ -0,0 +1,70 @@
+"""
+Colour engine for choropleths and charts.
+
+Every colormap is sampled once into a 256-entry lookup table of hex strings;
+a whole column of values is then coloured with one NumPy indexing operation
+instead of one matplotlib to_hex(cmap(norm(v))) call per row. Pages colour
+their frame once and hand the same colours to the map (the COLOR property of
+each feature, see utils.maps.get_colored_geojson) and to the Altair chart
+(scale=None), so both always agree. A colormap is a matplotlib name or a
+sequence of colour stops, like the branca legends drawn with legend().
+"""
+import matplotlib
+import numpy as np
+import pandas as pd
+import streamlit as st
+from branca.colormap import LinearColormap
+from matplotlib.colors import LinearSegmentedColormap
+
+LUT_SIZE = 256
+MISSING_COLOR = "#cccccc"  # no value
+COLOR = "__color__"  # feature property holding a feature's colour
+
+# ColorBrewer stops of the page legends
+YLORRD = ("#FFFFCC", "#FFEDA0", "#FED976", "#FEB24C", "#FD8D3C", "#FC4E2A", "#E31A1C", "#BD0026", "#800026")
+YLGNBU = ("#ffffcc", "#a1dab4", "#41b6c4", "#2c7fb8", "#253494")  # 5 classes (social indices)
+
+
+@st.cache_resource(show_spinner=False)
+def color_lut(cmap):
+    """
+    Read-only array of the LUT_SIZE hex colours of a colormap: a matplotlib name
+    ("RdYlGn", "YlOrRd_r"...) or a tuple of colour stops, evenly spaced.
+    """
+    colormap = matplotlib.colormaps[cmap] if isinstance(cmap, str) else LinearSegmentedColormap.from_list("stops", cmap)
+    rgb = colormap.resampled(LUT_SIZE)(np.arange(LUT_SIZE))[:, :3]
+    rgb = np.round(rgb * 255).astype(int)
+    lut = np.array([f"#{r:02x}{g:02x}{b:02x}" for r, g, b in rgb], dtype=object)
+    lut.flags.writeable = False
+    return lut
+
+
+def cmap_name(direction, custom=None):
+    """
+    Colormap of an indicator: high values green when its direction is "up"
+    (RdYlGn), red when "down" (RdYlGn_r); a `custom` colormap is reversed alike.
+    """
+    name = custom or "RdYlGn"
+    return name if direction == "up" else f"{name}_r"
+
+
+def colors_for(values, vmin, vmax, cmap="RdYlGn", missing=MISSING_COLOR):
+    """
+    Hex colour of every value (array, Series or scalar) on `cmap` between vmin
+    and vmax, values outside clamped, missing ones `missing`. A Series gives a
+    Series on the same index, a scalar a single colour.
+    """
+    x = np.asarray(pd.to_numeric(values, errors="coerce"), dtype=float)
+    span = vmax - vmin
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = (x - vmin) / span if span else np.zeros_like(x)
+    index = np.clip(np.nan_to_num(t * LUT_SIZE), 0, LUT_SIZE - 1).astype(int)
+    colors = np.where(np.isnan(x), missing, color_lut(cmap if isinstance(cmap, str) else tuple(cmap))[index])
+    if isinstance(values, pd.Series):
+        return pd.Series(colors, index=values.index, dtype=object)
+    return colors.item() if colors.ndim == 0 else colors
+
+
+def legend(vmin, vmax, caption, cmap=YLORRD):
+    """branca legend of colour stops `cmap` between vmin and vmax (its first colour alone if they are equal)."""
+    return LinearColormap([cmap[0]] if vmin == vmax else list(cmap), vmin=vmin, vmax=vmax, caption=caption)
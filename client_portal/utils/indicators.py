@@ -0,0 +1,96 @@
+"""
+Indicator catalogue of the social dashboards, compiled from social_codes.xlsx
+(labels FR/AR, aliases, groups, direction) and moyen_indices.xlsx (means and
+their colours).
+
+The two workbooks are turned once into plain read-only records indexed by
+code, so the pages never search DataFrames on a rerun. The compiled catalogue
+is rebuilt only when one of the workbooks changes (its content version moves).
+"""
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+
+import pandas as pd
+import streamlit as st
+
+from utils.load_once import cache_entries, get_workbook, workbook_handle
+
+LEVELS = ("pro", "reg", "nat")  # provincial, regional, national means
+
+
+class Indicator(NamedTuple):
+    code: str
+    category: Optional[str]
+    label_fr: str
+    label_ar: str
+    alias_fr: Optional[str]
+    alias_ar: Optional[str]
+    group: str
+    group_ar: str
+    direction: str                       # "up" (high is good) or "down"
+    means: Mapping[str, Optional[float]]  # level -> mean value
+    colors: Mapping[str, Optional[str]]   # level -> "#rrggbb" from the workbook
+
+
+def _text(value):
+    if value is None or pd.isna(value):
+        return None
+    return str(value)
+
+
+def normalize_hex_color(c):
+    """'#RGB' / '#RRGGBB' (with or without '#') -> '#…', anything else -> None."""
+    c = _text(c)
+    if c is None or not c.strip():
+        return None
+    c = c.strip()
+    if not c.startswith("#"):
+        c = "#" + c
+    if len(c) in (4, 7) and all(ch in "0123456789abcdefABCDEF" for ch in c[1:]):
+        return c
+    return None
+
+
+def _direction(value):
+    value = (_text(value) or "").strip().lower()
+    return value if value in ("up", "down") else "down"
+
+
+def _number(value):
+    value = pd.to_numeric(value, errors="coerce")
+    return None if pd.isna(value) else float(value)
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(1))
+def _compile(codes, means):
+    # One catalogue per (social_codes, moyen_indices) version, shared by every session
+    codes_df = get_workbook(codes)
+    moy_df = None if means is None else get_workbook(means)
+    moy_rows = {} if moy_df is None else {r["code"]: r for r in moy_df.to_dict("records")}
+
+    indicators = {}
+    for r in codes_df.to_dict("records"):
+        code = r["code"]
+        moy = moy_rows.get(code, {})
+        indicators[code] = Indicator(
+            code=code,
+            category=_text(r.get("category")),
+            label_fr=_text(r.get("signification_fr")) or code,
+            label_ar=_text(r.get("signification_ar")) or code,
+            alias_fr=_text(r.get("alias_fr")),
+            alias_ar=_text(r.get("alias_ar")),
+            group=_text(r.get("group")) or "Autres",
+            group_ar=(_text(r["group_ar"]) or "Autres") if "group_ar" in r else (_text(r.get("group")) or "Autres"),
+            direction=_direction(r.get("direction")),
+            means=MappingProxyType({lvl: _number(moy.get(f"moy_{lvl}")) for lvl in LEVELS}),
+            colors=MappingProxyType({lvl: normalize_hex_color(moy.get(f"c_moy_{lvl}")) for lvl in LEVELS}),
+        )
+    return MappingProxyType(indicators)
+
+
+def get_indicators(category=None):
+    """Read-only mapping code -> Indicator (workbook order), optionally for one category."""
+    catalogue = _compile(workbook_handle("social_codes"), workbook_handle("moyen_indices"))
+    if category is None:
+        return catalogue
+    return MappingProxyType({c: ind for c, ind in catalogue.items() if ind.category == category})
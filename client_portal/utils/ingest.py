@@ -0,0 +1,105 @@
+"""
+Build the ingest artifacts (GeoParquet, column stores, catalog.json and the
+vector tiles of the dense point layers) for every layer declared in
+utils/load_once.py, from the normalized layers (see utils/normalize.py).
+
+Run from client_portal/ after dropping new files into shared_data:
+
+    python -m utils.ingest
+
+Vector tiles are only cut when mapbox-vector-tile is installed (see utils/tiles.py).
+"""
+from utils.catalog import describe_layer, write_catalog
+from utils.load_once import (
+    LAYERS, SOURCE_DIGEST_KEY, columns_path, data_path, indicator_columns, parquet_path, replacing, source_digest,
+)
+from utils.normalize import normalize_layer
+from utils.tiles import TILE_LAYERS, build_tiles, mapbox_vector_tile
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def _with_source(schema, digest):
+    # Schema metadata recording the digest of the source the artifact is built from
+    return {**(schema.metadata or {}), SOURCE_DIGEST_KEY: digest.encode()}
+
+
+def build_geoparquet(name, gdf, digest):
+    """
+    Write shared_data/geoparquet/<name>.parquet (WKB geometry + typed columns),
+    recording the `digest` of its source file (see load_once.fresh).
+    """
+    parquet_path.mkdir(parents=True, exist_ok=True)
+    out = parquet_path / f"{name}.parquet"
+    with replacing(out) as tmp:
+        gdf.to_parquet(tmp, compression="zstd", index=False)
+        table = pq.read_table(tmp)
+        pq.write_table(table.replace_schema_metadata(_with_source(table.schema, digest)), tmp, compression="zstd")
+    return out
+
+
+def to_number(s):
+    """Numeric view of a column: numbers stay as-is, text keeps its first number ("57?" -> 57)."""
+    if pd.api.types.is_numeric_dtype(s):
+        return s
+    s = s.astype("string").str.replace(",", ".", regex=False).str.extract(r"(-?\d+(?:\.\d+)?)")[0]
+    return pd.to_numeric(s, errors="coerce")
+
+
+def build_column_store(name, gdf, digest):
+    """
+    Write shared_data/columns/<name>.arrow: the layer's indicator columns as one
+    uncompressed Arrow IPC record batch, so readers can memory-map it zero-copy.
+    Missing values are stored as NaN (not Arrow nulls) to keep numpy views possible.
+    The `digest` of the source file is recorded in the schema metadata.
+    """
+    cols = indicator_columns(name, gdf.columns)
+    if not cols:
+        return None
+    arrays = {}
+    for col in cols:
+        values = to_number(gdf[col])
+        if values.isna().any() or not pd.api.types.is_integer_dtype(values):
+            values = values.astype("float64")
+        arrays[col] = pa.array(np.ascontiguousarray(values.to_numpy()))
+    table = pa.table(arrays)
+    table = table.replace_schema_metadata(_with_source(table.schema, digest))
+
+    columns_path.mkdir(parents=True, exist_ok=True)
+    out = columns_path / f"{name}.arrow"
+    with replacing(out) as tmp, pa.OSFile(str(tmp), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return out
+
+
+def main():
+    entries = []
+    for name, fname in LAYERS.items():
+        src = data_path / fname
+        if not src.exists():
+            print(f"-- {name}: {fname} missing, skipped")
+            continue
+        digest = source_digest(src)
+        gdf = normalize_layer(gpd.read_file(src))
+        out = build_geoparquet(name, gdf, digest)
+        print(f"ok {name}: {src.stat().st_size / 1024:.0f} KB -> {out.stat().st_size / 1024:.0f} KB")
+        store = build_column_store(name, gdf, digest)
+        if store is not None:
+            print(f"   {name}: column store {store.name}")
+        if name in TILE_LAYERS:
+            if mapbox_vector_tile is None:
+                print(f"   {name}: vector tiles skipped (mapbox-vector-tile not installed)")
+            else:
+                print(f"   {name}: {build_tiles(name, gdf)} vector tiles")
+        entries.append(describe_layer(name, gdf))
+    out = write_catalog(entries)
+    print(f"ok catalog: {len(entries)} layers -> {out.name}")
+
+
+if __name__ == "__main__":
+    main()
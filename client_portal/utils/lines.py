@@ -0,0 +1,133 @@
+"""
+Line layers (road network) drawn as GeoJSON layers switched by zoom.
+
+Instead of one folium.PolyLine per line part (a Python call, a popup and a JS
+object per segment), a line layer is a single FeatureCollection per
+simplification tolerance: coloured per feature from a category column in one
+vectorized pass, and encoded once per layer version with its popup HTML as a
+property. zoomed_lines() draws one per zoom band (see utils/outlines.zoom_bands),
+so lines get finer as the user zooms in; the bands are static files the browser
+fetches only when they are first shown.
+LineString and MultiLineString rows are drawn alike: Leaflet reads both.
+"""
+import json
+
+import folium
+import streamlit as st
+
+from utils.colors import COLOR
+from utils.load_once import _resolve, cache_entries, get_layer
+from utils.maps import COORD_PRECISION, ZoomSwitch, quantize, static_url, write_static_geojson
+from utils.outlines import zoom_bands
+from utils.points import POPUP
+from utils.popups import get_popups
+
+# Simplification tolerances of line layers in degrees, coarsest first: the finest
+# (~5 m) is below a pixel up to zoom 13
+LINE_TOLERANCES = (0.005, 0.001, 0.0002, 0.00005)
+
+EMPTY = {"type": "FeatureCollection", "features": []}
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(2 * len(LINE_TOLERANCES)))
+def _line_geojson(handle, tolerance, precision, columns, popup_fields, popup_title,
+                  color_by, colors, default_color):
+    # One encoded FeatureCollection per (layer version, tolerance, columns, popups, colours)
+    gdf = get_layer(handle, columns + ((color_by,) if color_by else ()))
+    gdf = gdf.set_geometry(gdf.geometry.simplify(tolerance, preserve_topology=True))
+    gdf = quantize(gdf, precision)
+    extra = {}
+    if popup_fields is not None:
+        extra[POPUP] = get_popups(handle, popup_fields, popup_title)
+    if color_by in gdf.columns:
+        extra[COLOR] = gdf[color_by].map(dict(colors)).fillna(default_color)
+    else:
+        extra[COLOR] = default_color
+    return gdf.assign(**extra)[~gdf.geometry.is_empty].to_json()
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(2 * len(LINE_TOLERANCES)))
+def _line_file(handle, *args):
+    # One static file per _line_geojson() entry
+    return write_static_geojson(handle, args, lambda: _line_geojson(handle, *args))
+
+
+def _line_args(tolerance, precision, columns, popup_fields, popup_title, color_by, colors, default_color):
+    return (
+        tolerance, precision, tuple(columns),
+        None if popup_fields is None else tuple(map(tuple, popup_fields)),
+        popup_title, color_by, tuple((colors or {}).items()), default_color,
+    )
+
+
+def get_line_geojson(name, tolerance, columns=(), popup_fields=None, popup_title=None,
+                     color_by=None, colors=None, default_color="gray", precision=COORD_PRECISION):
+    """
+    GeoJSON text of a line layer simplified to `tolerance` (None if missing), with
+    its `columns` as properties, the popup HTML of every line with `popup_fields`
+    (see get_popups) and each line's colour: `colors[value of color_by]`, else
+    `default_color`.
+    """
+    handle = _resolve(name)
+    if handle is None:
+        return None
+    return _line_geojson(handle, *_line_args(
+        tolerance, precision, columns, popup_fields, popup_title, color_by, colors, default_color))
+
+
+def get_line_geojson_url(name, tolerance, columns=(), popup_fields=None, popup_title=None,
+                         color_by=None, colors=None, default_color="gray", precision=COORD_PRECISION):
+    """
+    URL of the get_line_geojson() text written under client_portal/static/geojson,
+    or None if the layer is missing or static serving is off. Same arguments.
+    """
+    handle = _resolve(name)
+    if handle is None or static_url() is None:
+        return None
+    return static_url("geojson", _line_file(handle, *_line_args(
+        tolerance, precision, columns, popup_fields, popup_title, color_by, colors, default_color)))
+
+
+def line_layer(geojson=None, weight=3, tooltip_field=None, popup=True, max_width=300, name=None, **kwargs):
+    """
+    One folium layer for all the lines of `geojson` (from get_line_geojson; None for
+    an empty layer a ZoomSwitch fills from a URL), each drawn in its own colour.
+    Style, tooltip (`tooltip_field`, a property name) and popup are set per feature
+    in the browser, so features added later get them too.
+    Extra keyword arguments go to folium.GeoJson.
+    """
+    on_each_feature = folium.JsCode(f"""
+(feature, layer) => {{
+    const p = feature.properties;
+    layer.setStyle({{color: p[{json.dumps(COLOR)}], weight: {float(weight)}}});
+    const field = {json.dumps(tooltip_field)};
+    if (field !== null && p[field] != null) {{
+        const text = document.createElement("span");
+        text.textContent = p[field];
+        layer.bindTooltip(text.innerHTML);
+    }}
+    if ({json.dumps(bool(popup))} && p[{json.dumps(POPUP)}] != null) {{
+        layer.bindPopup(p[{json.dumps(POPUP)}], {{maxWidth: {int(max_width)}}});
+    }}
+}}
+""")
+    return folium.GeoJson(EMPTY if geojson is None else geojson, name=name, on_each_feature=on_each_feature, **kwargs)
+
+
+def zoomed_lines(group, name, columns=(), popup_fields=None, popup_title=None, color_by=None,
+                 colors=None, default_color="gray", **layer_kwargs):
+    """
+    Add the lines of a layer to `group` (a FeatureGroup), one line_layer per zoom
+    band of LINE_TOLERANCES, switched by a ZoomSwitch. With static serving off the
+    bands would all be inlined: one layer at the finest tolerance is added instead.
+    `layer_kwargs` go to line_layer. Returns `group`.
+    """
+    args = dict(columns=columns, popup_fields=popup_fields, popup_title=popup_title,
+                color_by=color_by, colors=colors, default_color=default_color)
+    if static_url() is None:
+        return group.add_child(line_layer(get_line_geojson(name, LINE_TOLERANCES[-1], **args), **layer_kwargs))
+    bands = []
+    for tolerance, min_zoom, max_zoom in zoom_bands(LINE_TOLERANCES):
+        layer = line_layer(**layer_kwargs).add_to(group)
+        bands.append((layer, min_zoom, max_zoom, get_line_geojson_url(name, tolerance, **args)))
+    return group.add_child(ZoomSwitch(bands))
@@ -1,40 +1,552 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
 import geopandas as gpd
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyogrio
+import pyproj
+import shapely
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+from utils.normalize import normalize_layer
+
+base_path = Path(__file__).resolve().parent.parent  # client_portal/
+data_path = base_path.parent / "shared_data" / "geojson_files"
+parquet_path = base_path.parent / "shared_data" / "geoparquet"  # built by utils/ingest.py
+columns_path = base_path.parent / "shared_data" / "columns"     # built by utils/ingest.py
+catalog_path = base_path.parent / "shared_data" / "catalog.json"  # built by utils/ingest.py
+xls_path = base_path.parent / "shared_data"
+
+logger = logging.getLogger(__name__)
+
+LOADER_WORKERS = 8
+WATCH_INTERVAL = 5  # seconds between two scans of shared_data for changed files
+SNAPSHOT_KEY = "_data_snapshot"
+
+# Derived caches keyed by a Handle are bounded (st.cache_resource(max_entries=...)),
+# so the versions superseded by a hot reload are evicted instead of kept for the
+# life of the process
+VERSIONS_KEPT = 2    # current version + the one a pinned session may still read
+LAYER_VARIANTS = 96  # (layer, columns) projections per data version: one per indicator code on ct_driouch + the rest
+
+
+def cache_entries(variants):
+    """max_entries of a handle-keyed cache holding `variants` entries per data version."""
+    return VERSIONS_KEPT * variants
+
+# ---------------------------
+# Declared layers: name -> file in shared_data/geojson_files
+# ---------------------------
+LAYERS = {
+    "prov": "prov.geojson",
+    "bv": "bv.geojson",
+    "douars": "douars.geojson",
+    "res_routier": "res_routier.geojson",
+    "educ_commune": "educ_commune.geojson",
+    "educ_tot": "educ_tot.geojson",
+    "sociale_communes": "sociale_communes.geojson",
+    "ct_driouch": "ct_driouch.geojson",
+    "region_oriental": "region_oriental.geojson",
+    "maroc": "maroc.geojson",
+    "province1": "province1.geojson",
+    "ecoles_driouch": "ecoles_driouch.geojson",
+    "routes_driouch": "routes_driouch.geojson",
+    "pacha_benteib_quartiers": "pacha_benteib_quartiers.geojson",
+    "pacha_benteib_puits": "pacha_benteib_puits.geojson",
+    "pacha_benteib_mosq": "pacha_benteib_mosq.geojson",
+    "pacha_midar_quartiers": "pacha_midar_quartiers.geojson",
+    "pacha_midar_puits": "pacha_midar_puits.geojson",
+    "pacha_midar_mosq": "pacha_midar_mosq.geojson",
+}
+
+# Declared workbooks: name -> file in shared_data
+WORKBOOKS = {
+    "social_codes": "social_codes.xlsx",
+    "moyen_indices": "moyen_indices.xlsx",
+}
+
+# ---------------------------
+# Numeric indicator columns kept in the memory-mapped store (shared_data/columns/)
+# HCP layers also store every column named by an indicator code ("01", "02", ...)
+# ---------------------------
+INDICATOR_COLUMNS = {
+    "ct_driouch": ["Menages", "Population", "Etrangers", "Marocains"],
+    "sociale_communes": ["Menages", "Population", "Masculin", "Féminin", "Taux_des_h", "Scolarisat", "analphabé"],
+    "douars": ["Popul"],
+    "educ_tot": ["Effectif_A"],
+    "pacha_benteib_puits": ["Profondeur"],
+    "pacha_midar_puits": ["Profondeur"],
+}
+HCP_LAYERS = ("ct_driouch", "sociale_communes")
+
+
+def indicator_columns(name, columns):
+    """Columns of a layer that belong in the memory-mapped store."""
+    cols = [c for c in INDICATOR_COLUMNS.get(name, []) if c in columns]
+    if name in HCP_LAYERS:
+        cols += [c for c in columns if c.isdigit()]
+    return cols
+
+
+# ---------------------------
+# Artifact freshness: each artifact records the SHA-1 of the source it was built
+# from (mtimes are not enough: cp -p / unzip keep a replaced file's old mtime)
+# ---------------------------
+SOURCE_DIGEST_KEY = b"source_sha1"  # Parquet / Arrow schema metadata key
+
+
+@lru_cache(maxsize=256)
+def _file_digest(path, mtime_ns, size, ctime_ns):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+
+def source_digest(path):
+    """SHA-1 of a file, hashed again only when its stat changes (ctime included: copies cannot preserve it)."""
+    stat = path.stat()
+    return _file_digest(str(path), stat.st_mtime_ns, stat.st_size, stat.st_ctime_ns)
+
+
+@lru_cache(maxsize=256)
+def _recorded_digest(path, mtime_ns, size):
+    if path.endswith(".parquet"):
+        metadata = pq.read_schema(path).metadata
+    else:
+        with pa.memory_map(path, "r") as source:
+            metadata = pa.ipc.open_file(source).schema.metadata
+    digest = (metadata or {}).get(SOURCE_DIGEST_KEY)
+    return None if digest is None else digest.decode()
+
+
+def built_from(artifact):
+    """Source digest recorded in a GeoParquet / Arrow artifact (None if missing or not recorded)."""
+    if not artifact.exists():
+        return None
+    stat = artifact.stat()
+    return _recorded_digest(str(artifact), stat.st_mtime_ns, stat.st_size)
+
+
+def fresh(digest, src):
+    """
+    An artifact is used only if it was built from the current content of its source
+    file: `digest` is the source digest recorded in it (None if the artifact is missing).
+    """
+    return digest is not None and (not src.exists() or digest == source_digest(src))
+
+
+@contextmanager
+def replacing(path):
+    """
+    Write an artifact atomically: yields a temporary path next to `path`, moved over
+    it (os.replace) once the block succeeds. Readers, the watcher and memory maps of
+    the old file never see a partly written one; the old inode lives on until unmapped.
+    """
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def layer_file(name):
+    """
+    Path to read for a layer: its GeoParquet artifact when present and built from
+    the current GeoJSON source, else the GeoJSON itself (None if neither exists).
+    """
+    src = data_path / LAYERS[name]
+    artifact = parquet_path / f"{name}.parquet"
+    if fresh(built_from(artifact), src):
+        return artifact
+    return src if src.exists() else None
+
+
+def open_column_store(name):
+    """
+    Map shared_data/columns/<name>.arrow read-only and return {column: numpy array}.
+    The arrays are views on the mapped file, so every worker process shares the
+    same OS page-cache pages. Empty mapping when the store is missing or stale.
+    """
+    store = columns_path / f"{name}.arrow"
+    if name not in LAYERS or not fresh(built_from(store), data_path / LAYERS[name]):
+        return MappingProxyType({})
+    return _map_column_store(str(store), store.stat().st_mtime_ns)
+
+
+def views_buffer(array, buffer):
+    """Whether a numpy array lies inside an Arrow buffer's memory (a view, not a copy)."""
+    start = array.__array_interface__["data"][0]
+    return buffer.address <= start and start + array.nbytes <= buffer.address + buffer.size
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(len(INDICATOR_COLUMNS) + len(HCP_LAYERS)))
+def _map_column_store(path, mtime_ns):
+    # Keyed by mtime so a rebuilt store is mapped again instead of served stale.
+    # The store is one record batch (see ingest.build_column_store): its columns are
+    # single contiguous buffers, whereas a Table column would be combined into a copy
+    source = pa.memory_map(path, "r")
+    reader = pa.ipc.open_file(source)
+    if reader.num_record_batches != 1:
+        logger.error("column store %s has %d record batches, expected 1", path, reader.num_record_batches)
+        return MappingProxyType({})
+    batch = reader.get_batch(0)
+    source.seek(0)
+    mapped = source.read_buffer()  # the whole file, zero-copy
+    columns = {}
+    for col, values in zip(batch.schema.names, batch.columns):
+        array = values.to_numpy(zero_copy_only=True)
+        if not views_buffer(array, mapped):
+            logger.error("column %s of %s is not a view on the mapped file", col, path)
+        columns[col] = array
+    return MappingProxyType(columns)
+
+
+def _attach_column_store(name, gdf):
+    # Swap numeric columns for their memory-mapped twins (text columns keep their
+    # display values; their parsed numbers stay available via open_column_store)
+    for col, values in open_column_store(name).items():
+        if col in gdf.columns and len(values) == len(gdf) and pd.api.types.is_numeric_dtype(gdf[col]):
+            gdf[col] = pd.Series(values, index=gdf.index, name=col, copy=False)
+    return gdf
+
+
+@lru_cache(maxsize=None)
+def _crs_from_geo_metadata(crs_json):
+    # PROJJSON parsing dominates small reads, so parse each distinct CRS once
+    crs = json.loads(crs_json)
+    return None if crs is None else pyproj.CRS.from_user_input(crs)
+
+
+def read_geoparquet(path, columns=None):
+    """
+    Decode a GeoParquet file: Arrow columns -> pandas, WKB -> shapely.
+    Only `columns` (+ geometry) are read when given.
+    """
+    geo = json.loads(pq.read_schema(path).metadata[b"geo"])
+    geom_col = geo["primary_column"]
+    table = pq.read_table(path, columns=None if columns is None else [*columns, geom_col])
+
+    df = table.drop_columns([geom_col]).to_pandas()
+    geometry = shapely.from_wkb(table.column(geom_col).to_numpy(zero_copy_only=False))
+    # GeoParquet: a missing "crs" key means OGC:CRS84, an explicit null means unknown
+    crs = _crs_from_geo_metadata(json.dumps(geo["columns"][geom_col].get("crs", "OGC:CRS84")))
+    return gpd.GeoDataFrame(df, geometry=geometry, crs=crs)
+
+
+def layer_columns(path):
+    """Attribute columns of a layer file, read from its header only."""
+    if path.suffix == ".parquet":
+        schema = pq.read_schema(path)
+        geom_col = json.loads(schema.metadata[b"geo"])["primary_column"]
+        return [c for c in schema.names if c != geom_col]
+    return list(pyogrio.read_info(path)["fields"])
+
+
+def read_layer(name, columns=None):
+    """
+    Parse a layer from disk, optionally keeping only `columns` (+ geometry).
+    Requested columns the layer does not have are ignored.
+    """
+    path = layer_file(name)
+    if columns is not None:
+        available = set(layer_columns(path))
+        columns = [c for c in columns if c in available]
+    if path.suffix == ".parquet":
+        return read_geoparquet(path, columns)
+    # Raw GeoJSON (no ingest yet): normalize the whole layer as ingest would
+    gdf = normalize_layer(gpd.read_file(path))
+    return gdf if columns is None else gdf[[*columns, gdf.geometry.name]]
+
+
+def read_workbook(name):
+    """Parse a workbook; indicator codes are read as text and zero-padded ("1" -> "01")."""
+    df = pd.read_excel(xls_path / WORKBOOKS[name], dtype={"code": str})
+    if "code" in df.columns:
+        df["code"] = df["code"].str.zfill(2)
+    return df
+
+
+# ---------------------------
+# Snapshots: loading, hot reload and atomic swap
+# ---------------------------
+class Snapshot(NamedTuple):
+    """Immutable view of the loaded data; a reload swaps in a new one, never edits it."""
+    version: int
+    jobs: Mapping        # (kind, name) -> Future resolving to (value, seconds, digest)
+    signatures: Mapping  # (kind, name) -> stat signature of the input files
+
+
+def _declared():
+    return [("layer", name) for name in LAYERS] + [("workbook", name) for name in WORKBOOKS]
+
+
+def _inputs(kind, name):
+    # Every file a loaded entry depends on (source + ingest artifacts)
+    if kind == "layer":
+        return [data_path / LAYERS[name], parquet_path / f"{name}.parquet", columns_path / f"{name}.arrow"]
+    return [xls_path / WORKBOOKS[name]]
+
+
+def _present(kind, name):
+    if kind == "layer":
+        return layer_file(name) is not None
+    return (xls_path / WORKBOOKS[name]).exists()
+
+
+def _signature(kind, name):
+    sig = []
+    for path in _inputs(kind, name):
+        if path.exists():
+            stat = path.stat()
+            sig.append((path.name, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size))
+    return tuple(sig)
+
+
+def content_digest(kind, name):
+    """SHA-1 of the input files of a layer/workbook."""
+    h = hashlib.sha1()
+    for path in _inputs(kind, name):
+        if path.exists():
+            h.update(path.name.encode())
+            h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def _load(kind, name):
+    t0 = time.perf_counter()
+    digest = content_digest(kind, name)
+    if kind == "layer":
+        value = _attach_column_store(name, read_layer(name))
+    else:
+        value = read_workbook(name)
+    elapsed = time.perf_counter() - t0
+    logger.info("loaded %s %s in %.3fs", kind, name, elapsed)
+    return value, elapsed, digest
+
+
+def _release(state):
+    # The _registry entry was dropped (st.cache_resource.clear()): stop its watcher and
+    # let its pool finish the loads already queued, so a new registry does not run beside it
+    state["stop"].set()
+    state["pool"].shutdown(wait=False)
+    logger.info("data registry released")
+
+
+@st.cache_resource(show_spinner=False, on_release=_release)
+def _registry():
+    # Process-wide state: loader pool, current snapshot and the watcher thread
+    pool = ThreadPoolExecutor(max_workers=LOADER_WORKERS, thread_name_prefix="load_once")
+    jobs, signatures = {}, {}
+    for key in _declared():
+        if _present(*key):
+            signatures[key] = _signature(*key)
+            jobs[key] = pool.submit(_load, *key)
+    state = {
+        "pool": pool,
+        "lock": threading.Lock(),
+        "stop": threading.Event(),  # set by _release()
+        "snapshot": Snapshot(1, MappingProxyType(jobs), MappingProxyType(signatures)),
+    }
+    threading.Thread(target=_watch, args=(state,), name="load_once-watcher", daemon=True).start()
+    return state
+
+
+def _swap(state, key, job=None, signature=None):
+    # Build the next snapshot from the latest one and publish it with a single assignment
+    with state["lock"]:
+        snap = state["snapshot"]
+        jobs, signatures = dict(snap.jobs), dict(snap.signatures)
+        if job is not None:
+            jobs[key] = job
+        if signature is not None:
+            signatures[key] = signature
+        version = snap.version + (1 if job is not None else 0)
+        state["snapshot"] = Snapshot(version, MappingProxyType(jobs), MappingProxyType(signatures))
+
+
+def _on_reloaded(state, key, job):
+    if job.exception() is not None:
+        # Keep serving the previous data; the next change to the file retries
+        logger.error("reload of %s %s failed: %s", *key, job.exception())
+        return
+    _swap(state, key, job=job)
+    logger.info("swapped in new %s %s", *key)
+
+
+def check_for_changes(state):
+    """Rebuild (in the background) only the entries whose input files changed."""
+    snap = state["snapshot"]
+    for key in _declared():
+        if not _present(*key):
+            continue  # a removed file keeps its last loaded data
+        signature = _signature(*key)
+        if signature == snap.signatures.get(key):
+            continue
+        old = snap.jobs.get(key)
+        if old is not None and not old.done():
+            continue  # still loading; look again on the next scan
+        if old is not None and old.exception() is None and old.result()[2] == content_digest(*key):
+            _swap(state, key, signature=signature)  # touched, same content
+            continue
+        _swap(state, key, signature=signature)  # remembered now, so it is not resubmitted
+        job = state["pool"].submit(_load, *key)
+        job.add_done_callback(lambda j, key=key: _on_reloaded(state, key, j))
+
+
+def _watch(state):
+    while not state["stop"].wait(WATCH_INTERVAL):
+        try:
+            check_for_changes(state)
+        except Exception:
+            logger.exception("data watcher failed")
+
+
+def start_loading():
+    """
+    Start loading every declared layer and workbook on a thread pool (once per server
+    process) along with the file watcher, and return the latest Snapshot.
+    Callers block only on the futures they need (see get_layer / get_workbook).
+    """
+    return _registry()["snapshot"]
+
+
+def pin_snapshot():
+    """Pin the latest snapshot for this script run (app.py calls it on every rerun)."""
+    st.session_state[SNAPSHOT_KEY] = start_loading()
+
+
+def current_snapshot():
+    """Snapshot pinned for this run, so every read of a rerun sees the same data."""
+    snap = st.session_state.get(SNAPSHOT_KEY)
+    return snap if snap is not None else start_loading()
+
+
+class Handle(NamedTuple):
+    """
+    Immutable handle on one content version of a layer or workbook. It hashes as
+    (kind, name, version), so caches key on it instead of hashing frames, and two
+    datasets (or two versions of one) never share a cache entry.
+    """
+    kind: str
+    name: str
+    version: str  # content digest of the input files (see content_digest)
+
+
+def _handle(kind, name):
+    job = current_snapshot().jobs.get((kind, name))
+    if job is None:
+        return None
+    return Handle(kind, name, job.result()[2])  # waits for the load
+
+
+def layer_handle(name):
+    """Handle on the layer in the current snapshot (None if its file is missing)."""
+    if name not in LAYERS:
+        raise KeyError(f"Unknown layer: {name}")
+    return _handle("layer", name)
+
+
+def workbook_handle(name):
+    """Handle on the workbook in the current snapshot (None if its file is missing)."""
+    if name not in WORKBOOKS:
+        raise KeyError(f"Unknown workbook: {name}")
+    return _handle("workbook", name)
+
+
+def _resolve(name, kind="layer"):
+    """
+    Handle on a declared layer (or workbook) in the current snapshot, None if its
+    file is missing; a Handle is returned as-is. Every accessor taking a dataset
+    name goes through this, so each also accepts a Handle, to read exactly that version.
+    """
+    if isinstance(name, Handle):
+        return name
+    return workbook_handle(name) if kind == "workbook" else layer_handle(name)
+
+
+def _value(handle):
+    job = current_snapshot().jobs.get((handle.kind, handle.name))
+    if job is None or job.result()[2] != handle.version:
+        raise LookupError(f"{handle.kind} {handle.name} is no longer at version {handle.version[:10]}")
+    return job.result()[0]
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(LAYER_VARIANTS))
+def _projected(handle, columns):
+    # Column-selective read of the artifact, shared by every session asking for these columns
+    gdf = read_layer(handle.name, list(columns))
+    if content_digest("layer", handle.name) != handle.version:
+        # The file changed since this snapshot was taken: slice the snapshot's frame instead
+        full = _value(handle)
+        gdf = full[[c for c in columns if c in full.columns] + [full.geometry.name]]
+    return _attach_column_store(handle.name, gdf)
+
+
+def get_layer(name, columns=None):
+    """
+    Return the shared GeoDataFrame for a declared layer, or None if its file is missing.
+    With `columns`, only those attributes (+ geometry) are read from disk, once
+    per layer version.
+    The frame is shared by every session: treat it as read-only (use .copy()/.assign()).
+    """
+    handle = _resolve(name)
+    if handle is None:
+        return None
+    if columns is not None:
+        return _projected(handle, tuple(columns))
+    return _value(handle)
+
+
+def get_layer_columns(name):
+    """Attribute columns of a declared layer, read from the file header (None if missing)."""
+    if name not in LAYERS:
+        raise KeyError(f"Unknown layer: {name}")
+    path = layer_file(name)
+    return None if path is None else layer_columns(path)
+
+
+def get_workbook(name):
+    """
+    Return the shared DataFrame of a declared workbook (read-only), or None if missing.
+    """
+    handle = _resolve(name, "workbook")
+    if handle is None:
+        return None
+    return _value(handle)
+
 
-@st.cache_resource
 def load_data_once():
-    base_path = Path(__file__).resolve().parent.parent  # client_portal/
-    data_path = base_path.parent / "shared_data" / "geojson_files"
-
-
-    if "gdf_province" not in st.session_state:
-        st.session_state["gdf_province"] = gpd.read_file(data_path / "prov.geojson")
-    
-    if "gdf_bv" not in st.session_state:
-        st.session_state["gdf_bv"] = gpd.read_file(data_path / "bv.geojson")
-    
-    if "gdf_douars" not in st.session_state:
-        st.session_state["gdf_douars"] = gpd.read_file(data_path / "douars.geojson")
-
-
-
-    if "p_benteib_quartiers" not in st.session_state:
-        st.session_state["p_benteib_quartiers"] = gpd.read_file(data_path / "pacha_benteib_quartiers.geojson")
-    
-    if "p_benteib_puits" not in st.session_state:
-        st.session_state["p_benteib_puits"] = gpd.read_file(data_path / "pacha_benteib_puits.geojson")
-    
-    if "p_benteib_mosq" not in st.session_state:
-        st.session_state["p_benteib_mosq"] = gpd.read_file(data_path / "pacha_benteib_mosq.geojson")
-        
-        
-
-    if "p_midar_quartiers" not in st.session_state:
-        st.session_state["p_midar_quartiers"] = gpd.read_file(data_path / "pacha_midar_quartiers.geojson")
-    
-    if "p_midar_puits" not in st.session_state:
-        st.session_state["p_midar_puits"] = gpd.read_file(data_path / "pacha_midar_puits.geojson")
-    
-    if "p_midar_mosq" not in st.session_state:
-        st.session_state["p_midar_mosq"] = gpd.read_file(data_path / "pacha_midar_mosq.geojson")
\ No newline at end of file
+    """Return a read-only mapping name -> GeoDataFrame of every layer present on disk."""
+    layers = {}
+    for name in LAYERS:
+        gdf = get_layer(name)
+        if gdf is not None:
+            layers[name] = gdf
+    return MappingProxyType(layers)
+
+
+def load_report():
+    """Per-layer/workbook load status, timing and content version (for the Paramètres page)."""
+    rows = []
+    for (kind, name), job in start_loading().jobs.items():
+        row = {"type": kind, "nom": name, "état": "en cours", "secondes": None, "version": None}
+        if job.done():
+            if job.exception() is not None:
+                row["état"] = f"erreur: {job.exception()}"
+            else:
+                _, elapsed, digest = job.result()
+                row["état"] = "chargé"
+                row["secondes"] = round(elapsed, 3)
+                row["version"] = digest[:10]
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -0,0 +1,249 @@
+"""
+Map payload helpers: everything that ends up serialized into folium / Plotly HTML.
+"""
+import copy
+import hashlib
+
+import folium
+import numpy as np
+import pandas as pd
+import shapely
+import streamlit as st
+from branca.element import MacroElement
+from folium.template import Template
+from folium.utilities import get_obj_in_upper_tree
+
+from utils.colors import COLOR, YLORRD, colors_for
+from utils.load_once import LAYER_VARIANTS, _resolve, base_path, cache_entries, get_layer, replacing
+
+# ---------------------------
+# Coordinate quantization
+# ---------------------------
+COORD_PRECISION = 6  # decimals kept in map payloads (1e-6° ≈ 0.1 m)
+
+
+def _round(xy, precision):
+    # Junk sentinels (e.g. -1.8e308 in bv.geojson) would overflow: keep them as-is
+    with np.errstate(over="ignore", invalid="ignore"):
+        rounded = np.round(xy, precision)
+    return np.where(np.isfinite(rounded), rounded, xy)
+
+
+def quantize(gdf, precision=COORD_PRECISION):
+    """Copy of `gdf` with every coordinate rounded to `precision` decimals."""
+    geometry = shapely.transform(gdf.geometry.values, lambda xy: _round(xy, precision))
+    return gdf.set_geometry(geometry)
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(LAYER_VARIANTS))
+def _quantized(handle, precision, columns):
+    # One rounded copy per (layer version, precision, columns), shared by every session
+    return quantize(get_layer(handle, columns), precision)
+
+
+def get_map_layer(name, columns=None, precision=COORD_PRECISION):
+    """
+    Shared, read-only layer with quantized coordinates, for anything drawn on a map.
+    Pass the `columns` the page uses so only those attributes are read and kept.
+    """
+    handle = _resolve(name)
+    if handle is None:
+        return None
+    return _quantized(handle, precision, None if columns is None else tuple(columns))
+
+
+# ---------------------------
+# Pre-serialized GeoJSON
+# ---------------------------
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(LAYER_VARIANTS))
+def _geojson(handle, precision, columns):
+    # One encoded FeatureCollection per (layer version, precision, columns)
+    return _quantized(handle, precision, columns).to_json()
+
+
+def get_geojson(name, columns=None, precision=COORD_PRECISION):
+    """
+    GeoJSON text of a map layer, encoded once per layer version. folium.GeoJson
+    takes it as-is and parses a private copy, so styling never touches the cache;
+    Plotly needs json.loads(...) first.
+    """
+    handle = _resolve(name)
+    if handle is None:
+        return None
+    return _geojson(handle, precision, None if columns is None else tuple(columns))
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(LAYER_VARIANTS))
+def _colored_geojson(handle, precision, columns, value_column, cmap):
+    # One encoded, coloured FeatureCollection per (layer version, columns, value column, colormap)
+    gdf = _quantized(handle, precision, columns)
+    values = pd.to_numeric(gdf[value_column], errors="coerce")
+    colors = colors_for(values, float(values.min()), float(values.max()), cmap)
+    return gdf.assign(**{COLOR: colors}).to_json()
+
+
+def get_colored_geojson(name, columns, value_column, cmap=YLORRD, precision=COORD_PRECISION):
+    """
+    GeoJSON text of a map layer (see get_geojson; `columns` None for all of them)
+    with each feature's colour on `cmap` (see utils.colors), from the min to the
+    max of `value_column`, as its COLOR property: draw it with
+    style_function=color_style(...).
+    """
+    handle = _resolve(name)
+    if handle is None:
+        return None
+    columns = None if columns is None else tuple(dict.fromkeys([*columns, value_column]))
+    return _colored_geojson(handle, precision, columns, value_column, cmap if isinstance(cmap, str) else tuple(cmap))
+
+
+def color_style(**style):
+    """style_function filling every feature with its COLOR property; `style` adds Leaflet path options."""
+    return lambda feature: {"fillColor": feature["properties"][COLOR], **style}
+
+
+# ---------------------------
+# Static files (fetched by the browser)
+# ---------------------------
+def static_url(*parts):
+    """
+    URL of a file under client_portal/static/ (e.g. static_url("geojson", "prov.json")),
+    below the configured server.baseUrlPath, or None when Streamlit does not serve
+    that folder (server.enableStaticServing off): callers then inline their data.
+    """
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    base = st.get_option("server.baseUrlPath").strip("/")
+    return "/".join(["" if not base else f"/{base}", "app", "static", *parts])
+
+
+static_geojson_path = base_path / "static" / "geojson"  # served with the tiles (see utils/tiles.py)
+
+
+def write_static_geojson(handle, args, build):
+    """
+    Name of the file static/geojson/<layer>.<key>.json holding build() (GeoJSON
+    text), written once: `key` hashes the layer version and `args`, so the name
+    changes with the data and browsers may cache it for good.
+    """
+    key = hashlib.sha1(repr((handle.version, args)).encode()).hexdigest()[:12]
+    path = static_geojson_path / f"{handle.name}.{key}.json"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with replacing(path) as tmp:
+            tmp.write_text(build(), encoding="utf-8")
+    return path.name
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(4))
+def _static_geojson(handle, precision, columns):
+    # One file per (layer version, precision, columns)
+    return write_static_geojson(handle, (precision, columns), lambda: _geojson(handle, precision, columns))
+
+
+def get_geojson_url(name, columns=None, precision=COORD_PRECISION):
+    """
+    URL of a map layer's GeoJSON written once per layer version under
+    client_portal/static/geojson, or None if the layer is missing or static
+    serving is off (pass json.loads(get_geojson(...)) instead). Plotly takes it
+    as `geojson`: the browser fetches the geometry once and keeps it, so figures
+    only carry their data.
+    """
+    handle = _resolve(name)
+    if handle is None or static_url() is None:
+        return None
+    return static_url("geojson", _static_geojson(handle, precision, None if columns is None else tuple(columns)))
+
+
+# ---------------------------
+# Map layers
+# ---------------------------
+def choropleth_layer(geojson, style_function, tooltip=None, name=None,
+                     highlight_function=lambda feature: {"fillOpacity": 0.9}):
+    """
+    One styled polygon layer carrying its own tooltip and highlight (rather than a
+    styled layer plus a transparent copy just for the tooltip, which doubled the
+    payload and the polygons in the DOM).
+    """
+    return folium.GeoJson(
+        geojson,
+        name=name,
+        style_function=style_function,
+        highlight_function=highlight_function,
+        tooltip=tooltip,
+    )
+
+
+class ZoomSwitch(MacroElement):
+    """
+    Shows, of several layers of one FeatureGroup, only the one whose zoom band holds
+    the map's zoom (e.g. one outline per simplification tolerance, see
+    utils.outlines.zoom_bands). `bands` are (layer, min_zoom, max_zoom, url): max_zoom
+    None for no upper bound, and with a `url` the layer is created empty and its
+    GeoJSON fetched the first time it is shown. Add it to the group after the layers.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function (group, map) {
+            const bands = [
+                {%- for layer, min_zoom, max_zoom, url in this.bands %}
+                [{{ layer.get_name() }}, {{ min_zoom|tojson }}, {{ max_zoom|tojson }}, {{ url|tojson }}],
+                {%- endfor %}
+            ];
+            function update() {
+                const zoom = map.getZoom();
+                bands.forEach(function (band) {
+                    const [layer, minZoom, maxZoom, url] = band;
+                    const show = zoom >= minZoom && (maxZoom === null || zoom <= maxZoom);
+                    if (show && url) {
+                        band[3] = null;  // fetched once
+                        fetch(url).then(r => r.json()).then(data => layer.addData(data));
+                    }
+                    if (show && !group.hasLayer(layer)) { group.addLayer(layer); }
+                    if (!show && group.hasLayer(layer)) { group.removeLayer(layer); }
+                });
+            }
+            map.on("zoomend", update);
+            update();
+        })({{ this._parent.get_name() }}, {{ this.map_name }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, bands):
+        super().__init__()
+        self._name = "ZoomSwitch"
+        self.bands = [tuple(band) for band in bands]
+
+    def render(self, **kwargs):
+        self.map_name = get_obj_in_upper_tree(self, folium.Map).get_name()
+        super().render(**kwargs)
+
+
+# ---------------------------
+# Cached base maps
+# ---------------------------
+# Attributes holding the parsed GeoJSON and per-feature styles: only read when
+# the map is rendered, so clones can share them
+_SHARED_PAYLOADS = ("data", "style_map", "highlight_map")
+
+
+def _elements(element):
+    yield element
+    for child in element._children.values():
+        yield from _elements(child)
+
+
+def clone_map(base):
+    """
+    Copy of a cached base map for one rerun to extend and render. Build the base
+    map (tiles, controls, choropleth, legend) in an st.cache_resource function
+    keyed by the layer handles and theme, and never add to or render it directly:
+    folium maps are mutable. The element tree is copied, the payloads are shared.
+    """
+    root = base.get_root()
+    memo = {}
+    for element in _elements(root):
+        for attr in _SHARED_PAYLOADS:
+            value = element.__dict__.get(attr)
+            if value is not None:
+                memo[id(value)] = value
+    return copy.deepcopy(root, memo)._children[base.get_name()]
@@ -0,0 +1,76 @@
+"""
+Normalization applied once to every layer at ingest (and to raw GeoJSON read as
+a fallback), so pages never clean data on a rerun:
+
+- geometry rebuilt from Coord_Lon / Coord_Lat where it is missing,
+- EPSG:4326 coordinates,
+- rows without a usable geometry dropped (null, empty or junk coordinates),
+- text columns holding only numbers turned into numeric columns.
+"""
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+TARGET_CRS = "EPSG:4326"
+
+
+def _rebuild_points(gdf):
+    # Points for rows that have no geometry but both raw coordinates
+    if "Coord_Lon" not in gdf.columns or "Coord_Lat" not in gdf.columns:
+        return gdf
+    lon = pd.to_numeric(gdf["Coord_Lon"], errors="coerce")
+    lat = pd.to_numeric(gdf["Coord_Lat"], errors="coerce")
+    have_xy = gdf.geometry.isna() & lon.notna() & lat.notna()
+    if not have_xy.any():
+        return gdf
+    geometry = gdf.geometry.copy()
+    geometry[have_xy] = gpd.points_from_xy(lon[have_xy], lat[have_xy], crs=gdf.crs)
+    return gdf.set_geometry(geometry)
+
+
+def _to_wgs84(gdf):
+    if gdf.crs is None:
+        return gdf.set_crs(TARGET_CRS)
+    if gdf.crs.to_epsg() != 4326:
+        return gdf.to_crs(TARGET_CRS)
+    return gdf
+
+
+def usable_geometry(geometry):
+    """Mask of geometries that are not null/empty and lie within lon/lat range (drops e.g. -1.8e308)."""
+    ok = ~geometry.values.isna() & ~geometry.is_empty.to_numpy()
+    b = geometry.bounds.to_numpy()
+    with np.errstate(invalid="ignore"):
+        in_range = (np.isfinite(b).all(axis=1)
+                    & (np.abs(b[:, [0, 2]]) <= 180).all(axis=1)
+                    & (np.abs(b[:, [1, 3]]) <= 90).all(axis=1))
+    return ok & in_range
+
+
+def numeric_text(s):
+    """
+    Numeric version of a text column whose every value is a number, else None.
+    Fixed-width codes with leading zeros ("021670301") stay text.
+    """
+    if pd.api.types.is_numeric_dtype(s) or not (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)):
+        return None
+    text = s.dropna().astype(str).str.strip()
+    if text.empty or (text.str.match(r"^0\d").any() and text.str.len().nunique() == 1):
+        return None
+    values = pd.to_numeric(s, errors="coerce")
+    if values[s.notna()].isna().any():
+        return None
+    return values
+
+
+def normalize_layer(gdf):
+    """Cleaned EPSG:4326 copy of a layer with numeric-typed columns and a fresh 0..n-1 index."""
+    gdf = _to_wgs84(_rebuild_points(gdf))
+    gdf = gdf[usable_geometry(gdf.geometry)].reset_index(drop=True)
+    numeric = {}
+    for col in gdf.columns:
+        if col != gdf.geometry.name:
+            values = numeric_text(gdf[col])
+            if values is not None:
+                numeric[col] = values
+    return gdf.assign(**numeric) if numeric else gdf
@@ -0,0 +1,112 @@
+"""
+Reference outlines (Maroc / Région / Province) at several resolutions.
+
+The social dashboards only paint these polygons with a flat colour, so the
+full-resolution geometry is never needed: each outline is simplified once
+per process and per tolerance. zoomed_outline() draws one layer per zoom band
+(see zoom_bands), switched in the browser as the user zooms, so outlines get
+finer as the map zooms in; the bands are static files fetched when first shown.
+"""
+import json
+
+import folium
+import streamlit as st
+
+from utils.load_once import cache_entries, get_layer, layer_handle
+from utils.maps import ZoomSwitch, quantize, static_url, write_static_geojson
+
+# Simplification tolerances in degrees, coarsest first
+OUTLINE_TOLERANCES = (0.02, 0.005, 0.001, 0.0002)
+MAX_ZOOM = 20  # deepest Leaflet zoom considered when banding tolerances
+
+EMPTY = {"type": "FeatureCollection", "features": []}
+
+
+def tolerance_for_zoom(zoom, tolerances=OUTLINE_TOLERANCES):
+    """Coarsest of `tolerances` below half a screen pixel at this Leaflet zoom level."""
+    half_pixel = 0.5 * 360 / (256 * 2 ** zoom)
+    for tol in tolerances:
+        if tol <= half_pixel:
+            return tol
+    return tolerances[-1]
+
+
+def zoom_bands(tolerances=OUTLINE_TOLERANCES):
+    """
+    (tolerance, min_zoom, max_zoom) of every tolerance tolerance_for_zoom() picks,
+    coarsest first: the zooms [min_zoom, max_zoom] drawn at that tolerance
+    (max_zoom None for the finest). For utils.maps.ZoomSwitch.
+    """
+    bands = []
+    for zoom in range(MAX_ZOOM + 1):
+        tol = tolerance_for_zoom(zoom, tolerances)
+        if bands and bands[-1][0] == tol:
+            bands[-1][2] = zoom
+        else:
+            bands.append([tol, zoom, zoom])
+    bands[-1][2] = None
+    return tuple(map(tuple, bands))
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(3 * len(OUTLINE_TOLERANCES)))
+def _outline_geojson(handle, tolerance):
+    # One simplified, encoded outline per (layer version, tolerance), shared by every session
+    gdf = get_layer(handle)
+    return quantize(gdf.set_geometry(gdf.geometry.simplify(tolerance, preserve_topology=True))).to_json()
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(3 * len(OUTLINE_TOLERANCES)))
+def _outline_file(handle, tolerance):
+    # One static file per _outline_geojson() entry
+    return write_static_geojson(handle, (tolerance,), lambda: _outline_geojson(handle, tolerance))
+
+
+def outline_layer(geojson=None, style=None, tooltip_fields=(), value=None, value_label=None, name=None, **kwargs):
+    """
+    One folium layer for an outline (GeoJSON text from a zoom band; None for an
+    empty layer a ZoomSwitch fills from a URL), every polygon drawn with `style`.
+    Its tooltip lists the (column, label) `tooltip_fields` the feature has, then
+    `value_label`: `value` (the reference value the outline stands for). Style
+    and tooltip are set per feature in the browser, so features added later get
+    them too. Extra keyword arguments go to folium.GeoJson.
+    """
+    on_each_feature = folium.JsCode(f"""
+(feature, layer) => {{
+    const p = feature.properties;
+    const esc = v => {{ const s = document.createElement("span"); s.textContent = v; return s.innerHTML; }};
+    const row = (label, v) => "<tr><th align='left'>" + esc(label) + "</th><td>"
+        + esc(typeof v === "number" ? v.toLocaleString() : v) + "</td></tr>";
+    layer.setStyle({json.dumps(style or {})});
+    const rows = {json.dumps([list(f) for f in tooltip_fields])}
+        .filter(([col]) => p[col] != null).map(([col, label]) => row(label, p[col]));
+    const value = {json.dumps(value)};
+    if (value !== null) {{ rows.push(row({json.dumps(value_label)}, value)); }}
+    if (rows.length) {{
+        layer.bindTooltip("<div style='background-color:#F0EFEF;border:2px solid black;border-radius:3px;"
+            + "max-width:500px;'><table>" + rows.join("") + "</table></div>");
+    }}
+}}
+""")
+    return folium.GeoJson(EMPTY if geojson is None else geojson, name=name, on_each_feature=on_each_feature, **kwargs)
+
+
+def zoomed_outline(parent, name, zoom, layer_name=None, **layer_kwargs):
+    """
+    Add the outline of reference layer `name` to `parent` (map or FeatureGroup) as a
+    FeatureGroup `layer_name` holding one outline_layer per zoom band, switched by a
+    ZoomSwitch. With static serving off the bands would all be inlined: one layer
+    simplified for the initial `zoom` is added instead. `layer_kwargs` go to
+    outline_layer. Returns the group, or None if the layer is missing.
+    """
+    handle = layer_handle(name)
+    if handle is None:
+        return None
+    group = folium.FeatureGroup(name=layer_name).add_to(parent)
+    if static_url() is None:
+        geojson = _outline_geojson(handle, tolerance_for_zoom(zoom))
+        return group.add_child(outline_layer(geojson, control=False, **layer_kwargs))
+    bands = []
+    for tolerance, min_zoom, max_zoom in zoom_bands():
+        layer = outline_layer(control=False, **layer_kwargs).add_to(group)
+        bands.append((layer, min_zoom, max_zoom, static_url("geojson", _outline_file(handle, tolerance))))
+    return group.add_child(ZoomSwitch(bands))
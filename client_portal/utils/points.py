@@ -0,0 +1,100 @@
+"""
+Point layers (douars, wells, schools, BV) drawn as one GeoJSON layer each.
+
+Instead of one folium marker per row (a Python call, a JS object and a DOM/SVG
+node per point), a point layer is a single FeatureCollection, encoded once per
+layer version with its popup HTML as a property, and styled per feature by
+Leaflet. Circle points are painted on the map's canvas when the map is created
+with folium.Map(prefer_canvas=True).
+"""
+import folium
+import numpy as np
+import streamlit as st
+from folium.features import GeoJsonPopup, GeoJsonTooltip
+
+from utils.load_once import _resolve, cache_entries, get_layer
+from utils.maps import COORD_PRECISION, quantize
+from utils.popups import get_hover_text, get_labels, get_popups
+
+POPUP = "__popup__"  # feature property holding the popup HTML
+TOOLTIP = "__tooltip__"  # feature property holding the tooltip label
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(32))
+def _point_geojson(handle, precision, columns, popup_fields, popup_title, rows, tooltip):
+    # One encoded FeatureCollection per (layer version, columns, popups, rows, tooltip)
+    gdf = quantize(get_layer(handle, columns), precision)
+    if popup_fields is not None:
+        gdf = gdf.assign(**{POPUP: get_popups(handle, popup_fields, popup_title)})
+    if tooltip is not None:
+        gdf = gdf.assign(**{TOOLTIP: get_labels(handle, tooltip)})
+    if rows is not None:
+        gdf = gdf.iloc[list(rows)]
+    return gdf.to_json()
+
+
+def get_point_geojson(name, columns=(), popup_fields=None, popup_title=None, rows=None,
+                      tooltip=None, precision=COORD_PRECISION):
+    """
+    GeoJSON text of a point layer (None if missing) with its `columns` as properties
+    and, with `popup_fields` (see get_popups), the popup HTML of every point.
+    `rows` keeps only those row positions (e.g. one category of the layer).
+    `tooltip` is a label template (see get_labels) stored as the TOOLTIP property.
+    """
+    handle = _resolve(name)
+    if handle is None:
+        return None
+    return _point_geojson(
+        handle, precision, tuple(columns),
+        None if popup_fields is None else tuple(map(tuple, popup_fields)),
+        popup_title,
+        None if rows is None else tuple(rows),
+        tooltip,
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(4))
+def _point_arrays(handle, precision, hover_fields):
+    # Coordinates and hover text of one layer version, as read-only arrays
+    geometry = quantize(get_layer(handle, []), precision).geometry
+    lon = geometry.x.to_numpy(dtype=np.float32)
+    lat = geometry.y.to_numpy(dtype=np.float32)
+    lon.flags.writeable = lat.flags.writeable = False
+    text = None if hover_fields is None else get_hover_text(handle, hover_fields)
+    return lon, lat, text
+
+
+def get_point_arrays(name, hover_fields=None, precision=COORD_PRECISION):
+    """
+    (lon, lat, text) read-only arrays of a point layer for Plotly traces, or None
+    if missing: float32 coordinates and, with `hover_fields` (see get_hover_text), the
+    hover text of every point (else None).
+    """
+    handle = _resolve(name)
+    if handle is None:
+        return None
+    return _point_arrays(
+        handle, precision, None if hover_fields is None else tuple(map(tuple, hover_fields)))
+
+
+def point_layer(geojson, marker=None, tooltip_field=None, popup=True, max_width=300, name=None, **kwargs):
+    """
+    One folium layer for all the points of `geojson` (from get_point_geojson).
+    `marker` is the folium.CircleMarker / folium.Marker template of every point;
+    `tooltip_field` a property name, or several to use the first one present.
+    Extra keyword arguments go to folium.GeoJson (style_function, on_each_feature...).
+    """
+    layer = folium.GeoJson(
+        geojson,
+        name=name,
+        marker=marker if marker is not None else folium.CircleMarker(radius=5, fill=True),
+        popup=GeoJsonPopup([POPUP], labels=False, max_width=max_width) if popup else None,
+        **kwargs,
+    )
+    if tooltip_field is not None:
+        fields = [tooltip_field] if isinstance(tooltip_field, str) else list(tooltip_field)
+        features = layer.data.get("features") or [{}]
+        present = [f for f in fields if f in features[0].get("properties", {})]
+        if present:
+            layer.add_child(GeoJsonTooltip([present[0]], labels=False))
+    return layer
@@ -0,0 +1,153 @@
+"""
+Popup HTML of point layers, built from a declarative field list.
+
+The popups of a whole layer are templated at once with vectorized string
+operations (one pass per field, not one f-string per row and per rerun) and
+kept once per layer version. The returned array follows the rows of the layer,
+so it lines up with get_layer() / get_map_layer() of the same layer.
+
+For lazy popups, markers are drawn without any: each one carries its layer and
+row position in its tooltip (row_tooltip()), clicked_row() reads them back from
+what st_folium reports as clicked, and the page shows that row's popup next to
+the map, so the map payload does not grow with popup richness.
+"""
+import json
+import string
+
+import folium
+import pandas as pd
+import streamlit as st
+
+from utils.load_once import _resolve, cache_entries, get_layer
+
+# (label, column) pairs, in display order
+DOUAR_FIELDS = (("Douar", "Douar"), ("Milieu", "Milieu"), ("Population", "Popul"))
+
+_BOX = '<div style="background-color:#f9f9f9; padding:8px; border-radius:6px; border:1px solid #ccc;">'
+_TABLE = '<table style="width:300px; font-size:13px; font-family: arial, sans-serif;">'
+_ROW = '<tr style="background-color:#dddddd;"><th align="left">{}</th><td>'
+
+
+def _text(s):
+    # Cell text: missing values shown empty, markup characters escaped
+    text = s.astype("string").fillna("")
+    return text.str.replace("&", "&amp;").str.replace("<", "&lt;").str.replace(">", "&gt;")
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(16))
+def _popups(handle, fields, title):
+    # One array of popup HTML per (layer version, fields, title), shared by every session
+    gdf = get_layer(handle, [col for _, col in fields])
+    empty = pd.Series("", index=gdf.index, dtype="string")
+    cells = [(label, _text(gdf[col]) if col in gdf.columns else empty) for label, col in fields]
+
+    if title is None:
+        html = empty
+        for label, text in cells:
+            html = html + f"<b>{label}:</b> " + text + "<br>"
+    else:
+        html = empty + f'{_BOX}<h4 style="margin-top:0; margin-bottom:8px;">{title}</h4>{_TABLE}'
+        for label, text in cells:
+            html = html + _ROW.format(label) + text + "</td></tr>"
+        html = html + "</table></div>"
+
+    popups = html.to_numpy(dtype=object)
+    popups.flags.writeable = False
+    return popups
+
+
+def get_popups(name, fields, title=None):
+    """
+    Read-only array with the popup HTML of every feature of a layer (None if missing).
+    `fields` is a sequence of (label, column); without `title` each field is a
+    "<b>label:</b> value" line, with a `title` they form a boxed table under it.
+    """
+    handle = _resolve(name)
+    if handle is None:
+        return None
+    return _popups(handle, tuple(map(tuple, fields)), title)
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(4))
+def _hover_text(handle, fields):
+    # Plain "label: value" lines per (layer version, fields): Plotly escapes every
+    # "<" of its text, so hover text keeps markup to the line breaks
+    gdf = get_layer(handle, [col for _, col in fields])
+    text = pd.Series("", index=gdf.index, dtype="string")
+    for label, col in fields:
+        if col in gdf.columns:
+            text = text + f"{label}:  " + _text(gdf[col]) + "<br>"
+    hover = text.to_numpy(dtype=object)
+    hover.flags.writeable = False
+    return hover
+
+
+def get_hover_text(name, fields):
+    """
+    Read-only array with the hover text of every feature of a layer (None if
+    missing), one "label: value" line per (label, column) of `fields`, for Plotly
+    traces.
+    """
+    handle = _resolve(name)
+    if handle is None:
+        return None
+    return _hover_text(handle, tuple(map(tuple, fields)))
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(16))
+def _labels(handle, template):
+    # One array of labels per (layer version, template), one pass per field
+    parts = list(string.Formatter().parse(template))
+    gdf = get_layer(handle, [col for _, col, _, _ in parts if col])
+    text = pd.Series("", index=gdf.index, dtype="string")
+    for literal, col, _, _ in parts:
+        text = text + literal
+        if col:
+            text = text + (_text(gdf[col]) if col in gdf.columns else "")
+    labels = text.to_numpy(dtype=object)
+    labels.flags.writeable = False
+    return labels
+
+
+def get_labels(name, template):
+    """
+    Read-only array with a short label per feature of a layer (None if missing),
+    `template` filled in with its columns: "Lycées: {Nom_Etabli}", "{Nature}: {Nom_Etabli}".
+    """
+    handle = _resolve(name)
+    if handle is None:
+        return None
+    return _labels(handle, template)
+
+
+# ---------------------------
+# Lazy popups
+# ---------------------------
+ROW_SEP = "|"  # ends the hidden "<layer>:<row>" prefix of a row_tooltip()
+
+
+def row_tooltip(name, field):
+    """
+    on_each_feature handler of a point layer (see utils/points.point_layer) giving
+    every marker a tooltip with its `field` property, preceded by the layer `name`
+    and its feature id (its row position) in a hidden span: st_folium returns the
+    whole text as `last_object_clicked_tooltip`, for clicked_row().
+    """
+    return folium.JsCode(f"""
+(feature, layer) => {{
+    const text = document.createElement("span");
+    text.textContent = feature.properties[{json.dumps(field)}] ?? "";
+    layer.bindTooltip('<span hidden>{name}:' + feature.id + '{ROW_SEP}</span>' + text.innerHTML);
+}}
+""")
+
+
+def clicked_row(tooltip, name):
+    """
+    Row position of the clicked point of layer `name`, from st_folium's
+    `last_object_clicked_tooltip` on a layer drawn with row_tooltip(), or None if
+    no point of that layer was clicked.
+    """
+    prefix, sep, _ = (tooltip or "").partition(ROW_SEP)
+    layer, _, row = prefix.rpartition(":")
+    return int(row) if sep and layer == name and row.isdigit() else None
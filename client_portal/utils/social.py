@@ -0,0 +1,666 @@
+"""
+HCP social dashboards (pages/dashboard_social1.py, 2 and 3).
+
+The three pages draw the same dashboard for one indicator category of
+social_codes.xlsx each: a communes choropleth of the chosen indicator over the
+provincial / regional / national reference outlines, a bar chart of the
+communes with the reference means, and optional point / line overlays.
+Each page only calls social_dashboard() with its category.
+"""
+import altair as alt
+import folium
+import pandas as pd
+import streamlit as st
+from folium import plugins as fp
+from folium.features import GeoJsonTooltip
+from shapely.geometry import Point
+from streamlit_folium import st_folium
+
+from utils.catalog import layer_center
+from utils.colors import cmap_name, colors_for
+from utils.indicators import get_indicators
+from utils.load_once import cache_entries, get_layer_columns, layer_handle, workbook_handle
+from utils.maps import choropleth_layer, clone_map, get_geojson, get_map_layer
+from utils.outlines import zoomed_outline
+from utils.points import get_point_geojson, point_layer
+from utils.popups import DOUAR_FIELDS
+from utils.tiles import tile_layer
+
+# ============================================================
+# CONFIG: set your layer names here (declared in utils/load_once.py)
+# ============================================================
+REGION_LAYER = "region_oriental"     # <-- CHANGE to your real layer
+NATIONAL_LAYER = "maroc"             # <-- CHANGE to your real layer
+PROVINCIAL_LAYER = "province1"       # <-- CHANGE to your real layer
+
+SCHOOLS_LAYER = "ecoles_driouch"     # optional layer
+ROADS_LAYER = "routes_driouch"       # optional layer
+
+# Only the attributes drawn are read; the communes layer is fetched once the
+# indicator code is known (one indicator column at a time)
+COMMUNE_FIELDS = ["province_f", "commune_fr", "commune_ar", "Menages", "Population"]
+
+# ------------------------------------------------------------
+# Optional: override colormap for specific indicator codes
+# ------------------------------------------------------------
+CUSTOM_CMAPS = {
+    "05": "autumn",   # exemple
+    "19": "autumn",    # exemple
+}
+# IMPORTANT: votre code est zfill(2), donc "20" et "25" ici
+
+
+def commune_colors(gdf, code, direction):
+    """Colour of every commune for indicator `code`, all at once (see utils/colors.py)."""
+    values = gdf[code]
+    return colors_for(values, float(values.min()), float(values.max()), cmap_name(direction, CUSTOM_CMAPS.get(code)))
+
+
+@st.cache_resource(show_spinner=False, max_entries=cache_entries(32))
+def create_map(social, codes, means, outlines, selected_code, mode, lang, zoom):
+    # One base map per (data versions, indicator, mode, language, zoom); st_folium adds the overlays.
+    # `codes` / `means` (workbooks) and `outlines` (reference layers) are the handles it is drawn from
+    indicator = get_indicators()[selected_code]
+    selected_label = getattr(indicator, "label_fr" if lang == "Français" else "label_ar")
+    mean_val1, moy_reg, moy_nat = (indicator.means[k] for k in ("pro", "reg", "nat"))
+    mean_color1, mean_color2, mean_color3 = (indicator.colors.get(k) or "#666666" for k in ("pro", "reg", "nat"))
+    gdf_social = get_map_layer(social, COMMUNE_FIELDS + [selected_code])
+    social_geojson = get_geojson(social, COMMUNE_FIELDS + [selected_code])  # encoded once per layer version
+    fills = dict(zip(gdf_social.index.astype(str), commune_colors(gdf_social, selected_code, indicator.direction)))
+
+    center = layer_center("ct_driouch")
+    m = folium.Map(location=center, zoom_start=zoom, control_scale=True, prefer_canvas=True)
+
+    # Basemaps
+    folium.TileLayer("CartoDB positron", name="CartoDB Positron").add_to(m)
+    folium.TileLayer(
+        tiles="https://server.arcgisonline.com/ArcGIS/rest/services/World_Topo_Map/MapServer/tile/{z}/{y}/{x}",
+        attr="Tiles © Esri",
+        name="ESRI Terrain",
+        overlay=False,
+        control=True,
+    ).add_to(m)
+
+    fp.Fullscreen(
+        position="topleft",
+        title="Fullscreen",
+        title_cancel="Exit",
+        force_separate_button=True,
+    ).add_to(m)
+
+    # ------------------------------------------------------------
+    # A) Background layer (UNDER communes) — only for Regional/National
+    # ------------------------------------------------------------
+    if (mode == "Indice National"):
+        fg_bg = folium.FeatureGroup(
+            name=("Maroc" if (lang == "Français") else "المغرب"  ),
+            overlay=True,
+            control=True,
+            show=True,
+        ).add_to(m)
+    elif (mode == "Indice Régional"):
+            fg_bg = folium.FeatureGroup(
+            name=("Région" if (lang == "Français") else  "الجهة"),
+            overlay=True,
+            control=True,
+            show=True,
+        ).add_to(m)
+
+    def add_reference(parent, bg_layer, value, mean_color, weight, layer_name, value_label, tooltip_name_fields):
+        """
+        Draw a reference outline (province / region / Maroc) filled with the colour
+        of its mean `value`, at the resolution of the zoom the user is at
+        (see utils/outlines.zoomed_outline).
+        """
+        if value is None or pd.isna(value):
+            return
+        zoomed_outline(
+            parent, bg_layer, zoom,
+            layer_name=layer_name,
+            style={"fillColor": mean_color, "color": mean_color, "weight": weight, "fillOpacity": 0.9},
+            tooltip_fields=[(f, a_fr if lang == "Français" else a_ar) for f, a_fr, a_ar in tooltip_name_fields],
+            value=float(value),
+            value_label=value_label,
+        )
+
+    def add_background_reference(mean_color, bg_layer, value, layer_name, tooltip_name_fields=None):
+        """Background polygon below communes, coloured like its mean on the chart."""
+        add_reference(
+            fg_bg, bg_layer, value, mean_color, 2, layer_name,
+            (f"{selected_label} (réf.)" if lang == "Français" else f"{selected_label} (مرجع)"),
+            tooltip_name_fields or [],
+        )
+
+    def add_provincial_reference_layer(bg_layer, mean_val, mean_color, layer_name, tooltip_name_fields=None):
+        """
+        Adds provincial reference layer (gdf_prv) in Regional/National modes,
+        coloured like the provincial mean (mean_val).
+        """
+        add_reference(
+            m, bg_layer, mean_val, mean_color, 3, layer_name,
+            ("Moyenne provinciale" if lang == "Français" else "المتوسط الإقليمي"),
+            tooltip_name_fields or [],
+        )  # couche au niveau global (au-dessus du fond, sous les communes si ajoutée avant choropleth)
+
+    # ------------------------------------------------------------
+    # Add provincial reference layer (gdf_prv) in Regional/National
+    # using active_mean1 = (pro, moy_pro, mean_color1)
+    # ------------------------------------------------------------
+    if mode in ("Indice Régional", "Indice National"):
+        add_provincial_reference_layer(
+            PROVINCIAL_LAYER,
+            mean_val1,        # moy_pro
+            mean_color1,      # color computed from palette for moy_pro
+            layer_name=("Province" if lang == "Français" else "الإقليم"),
+            tooltip_name_fields=[
+                ("province_f", "Province", "الإقليم"),
+                ("nom_prov", "Province", "الإقليم"),  # si existe dans gdf_prv
+            ],
+        )
+    # Add ONLY the requested background depending on mode
+    if mode == "Indice Régional":
+        add_background_reference(
+            mean_color2,
+            REGION_LAYER,
+            moy_reg,
+            layer_name=("Région (référence)" if lang == "Français" else "الجهة (مرجع)"),
+            tooltip_name_fields=[
+                ("nom_region", "Région", "الجهة"),
+                ("nom_arabe", "Nom arabe", "الاسم بالعربية"),
+            ],
+        )
+
+    elif mode == "Indice National":
+        add_background_reference(
+            mean_color3,
+            NATIONAL_LAYER,
+            moy_nat,
+            layer_name=("Maroc (référence)" if lang == "Français" else "المغرب (مرجع)"),
+            tooltip_name_fields=[
+                ("nom_region", "Nom", "الاسم"),
+            ],
+        )
+
+
+
+
+    # ------------------------------------------------------------
+    # B) Communes choropleth (ALWAYS ON TOP OF background)
+    # ------------------------------------------------------------
+    fg_communes = folium.FeatureGroup(
+        name=("Communes – indices" if lang == "Français" else "الجماعات – المؤشرات"),
+        overlay=True,
+        control=True,
+        show=True,
+    ).add_to(m)
+
+    def commune_style_fn(feat):
+        return {
+            "fillColor": fills[feat["id"]],  # by GeoJSON feature id, same colors as the chart
+            "color": "black",
+            "weight": 0.8,
+            "fillOpacity": 0.75,
+        }
+
+    # ------------------------------------------------------------
+    # C) Choropleth carrying its own tooltip + highlight
+    # ------------------------------------------------------------
+    tooltip_fields, tooltip_aliases = [], []
+    for field, alias_fr, alias_ar in [
+        ("province_f", "Province", "العمالة / الإقليم"),
+        ("commune_fr", "Commune", "الجماعة"),
+        ("Menages", "Ménages", "الأسر"),
+        ("Population", "Population", "السكان"),
+    ]:
+        if field in gdf_social.columns:
+            tooltip_fields.append(field)
+            tooltip_aliases.append(alias_fr if lang == "Français" else alias_ar)
+
+    tooltip_fields.append(selected_code)
+    tooltip_aliases.append(selected_label)
+
+    choropleth_layer(
+        social_geojson,
+        name=f"Choropleth – {selected_label}",
+        style_function=commune_style_fn,
+        highlight_function=lambda x: {"weight": 2, "fillOpacity": 0.9},
+        tooltip=GeoJsonTooltip(
+            fields=tooltip_fields,
+            aliases=tooltip_aliases,
+            localize=True,
+            sticky=False,
+            labels=True,
+            max_width=800,
+            style="background-color:#F0EFEF;border:2px solid black;border-radius:3px;",
+        ),
+    ).add_to(fg_communes)
+
+    return m
+
+
+def social_dashboard(category):
+    """Draw the social dashboard of the indicators of one social_codes.xlsx `category`."""
+    social_columns = get_layer_columns("ct_driouch")  # communes (province) polygons
+    douars_geojson = get_point_geojson("douars", ["Douar"], DOUAR_FIELDS)  # douars points, popups included
+
+    # Optional: schools (falls back to educ_tot) / roads
+    schools_layer = SCHOOLS_LAYER
+    schools_geojson = get_point_geojson(schools_layer, ["Nom_Etabli", "Nom"])
+    if schools_geojson is None:
+        schools_layer = "educ_tot"
+        schools_geojson = get_point_geojson(schools_layer, ["Nom_Etabli", "Nom"])
+    gdf_roads = get_map_layer(ROADS_LAYER, [])
+    roads_geojson = get_geojson(ROADS_LAYER, [])
+
+    # Optional: region / national / provincial outlines are drawn in create_map(),
+    # simplified for the zoom the map is at (see utils/outlines.py)
+
+    # ---------------------------
+    # Codes → labels (FR / AR) + direction + group + alias + means (see utils/indicators.py)
+    # ---------------------------
+    indicators = get_indicators(category)
+
+    # ============================================================
+    # TOP UI: language + mode buttons (styled)
+    # ============================================================
+    st.markdown(
+        """
+<style>
+/* pill-like radio */
+div[role="radiogroup"] > label {
+    background: #20768A;
+    padding: 8px 14px;
+    border-radius: 10px;
+    margin-right: 10px;
+    border: 1px solid #99999955;
+}
+div[role="radiogroup"] > label:hover {
+    border-color: #F54927;
+}
+</style>
+""",
+        unsafe_allow_html=True,
+    )
+
+    col_top1, col_top2,col_top3 = st.columns([1, 2, 2])
+
+    with col_top1:
+        lang = st.radio(
+            "🌐 Langue / اللغة",
+            options=["Français", "العربية"],
+            horizontal=True,
+            key="lang_social",
+        )
+
+    with col_top2:
+        options_map = {
+        "Indice Provincial": "المؤشر الإقليمي",
+        "Indice Régional": "المؤشر الجهوي",
+        "Indice National": "المؤشر الوطني"
+    }
+        if lang == "Français":
+            mode = st.radio(
+                "Mode",
+                options=["Indice Provincial", "Indice Régional", "Indice National"],
+                horizontal=True,
+                key="mode_social",
+            )
+        else:
+            mode = st.radio(
+                "المستوى",
+                options=options_map.keys(),
+                format_func=lambda x: options_map.get(x),
+                horizontal=True,
+                key="mode_social",
+
+        )
+
+    st.markdown("---")
+
+    label_attr = "label_fr" if lang == "Français" else "label_ar"
+    alias_attr = "alias_fr" if lang == "Français" else "alias_ar"
+    group_attr = "group" if lang == "Français" else "group_ar"
+
+    # ============================================================
+    # RIGHT PANEL: controls (grouping + indicator search + layers)
+    # ============================================================
+    # determine which codes exist in the polygons
+    all_codes = list(indicators)
+    available_codes = [c for c in all_codes if c in social_columns]
+    if not available_codes:
+        st.error("Aucun code d'indice trouvé dans ct_driouch.geojson.")
+        st.write(all_codes)
+        st.stop()
+
+    # Create a label for each code
+    def build_display_label(code: str) -> str:
+        ind = indicators.get(code)
+        if ind is None:
+            return code
+        sig = getattr(ind, label_attr)
+        ali = getattr(ind, alias_attr)
+        if ali is not None:
+            return f"{code} — {ali}"
+        # fallback: shorten signification to first ~3 words
+        sig_short = " ".join(str(sig).split()[:3])
+        return f"{code} — {sig_short}"
+
+    # Group -> list of codes
+    groups = list(dict.fromkeys(getattr(ind, group_attr) for ind in indicators.values()))
+
+    with col_top3:
+        if lang == "Français":
+            # st.subheader("Contrôles")
+
+            chosen_group = st.radio(
+            "Groupes d'indices",
+            options=groups, index=0,
+            horizontal=True,
+            key="groupe_indices",
+            )
+        else:
+            st.subheader("إعدادات التحكم")
+            chosen_group = st.radio(
+            "صنف المؤشرات",
+            options=groups, index=0,
+            horizontal=True,
+            key="groupe_indices",)
+        # chosen_group = st.selectbox("Groupe", options=groups, index=0)
+        group_codes = [c for c, ind in indicators.items() if getattr(ind, group_attr) == chosen_group]
+        group_codes = [c for c in group_codes if c in available_codes]
+        if not group_codes:
+            group_codes = available_codes
+
+    # ============================================================
+    # MAIN LAYOUT: left chart / center map / right controls
+    # ============================================================
+    col_chart, col_map, col_ctrl = st.columns([2, 2, 1])
+
+    with col_ctrl:
+
+        def render_code_buttons(group_codes, lang, key_prefix="ind_btn", n_cols=2):
+            """
+            Returns selected_code (str) using a grid of buttons.
+            Persists selection in st.session_state[f"{key_prefix}_selected"].
+            """
+            state_key = f"{key_prefix}_selected"
+
+            # Ensure an initial selection
+            if state_key not in st.session_state or st.session_state[state_key] not in group_codes:
+                st.session_state[state_key] = group_codes[0] if group_codes else None
+
+            # Prepare labels
+            items = []
+            for code in group_codes:
+                label = build_display_label(code)
+                # keep only the "alias" part shown on button if you want:
+                # e.g. "002 — Activité..." -> "Activité..."
+                if "—" in label:
+                    short = label.split("—", 1)[1].strip()
+                else:
+                    short = label
+                items.append((code, short))
+
+            # Grid
+            cols = st.columns(n_cols)
+            for i, (code, short_label) in enumerate(items):
+                c = cols[i % n_cols]
+
+                # Visual hint for selected item (simple)
+                is_selected = (code == st.session_state[state_key])
+                btn_label = f"✅ {short_label}" if is_selected else short_label
+
+                if c.button(btn_label, key=f"{key_prefix}_{code}", use_container_width=True):
+                    st.session_state[state_key] = code
+
+            return st.session_state[state_key]
+
+
+        # indicator buttons instead of selectbox
+        if lang == "Français":
+            st.markdown("### Indicateurs")
+        else:
+            st.markdown("### المؤشرات")
+
+        # Use 2 or 3 columns depending on how many buttons you want per row
+        selected_code = render_code_buttons(
+            group_codes=group_codes,
+            lang=lang,
+            key_prefix="social_indicator",
+            n_cols=2,   # set 3 if you want more compact grid
+        )
+
+
+        # label full (for chart title)
+        selected_label = getattr(indicators[selected_code], label_attr)
+    col_zoom,col_coche = st.columns([2, 2])
+
+    if lang == "Français":
+        with col_coche:
+            st.markdown("### Couches")
+            show_douars = st.checkbox("Douars", value=False, disabled=(douars_geojson is None))
+            show_schools = st.checkbox("Écoles", value=False, disabled=(schools_geojson is None))
+            show_roads = st.checkbox("Routes", value=False, disabled=(gdf_roads is None))
+        with col_zoom:
+            st.markdown("### Options")
+            if mode == "Indice Régional":
+                zoom = st.slider("Zoom initial", min_value=5, max_value=14, value=7)
+            elif mode == "Indice National":
+                zoom = st.slider("Zoom initial", min_value=5, max_value=14, value=6)
+            else:
+                zoom = st.slider("Zoom initial", min_value=5, max_value=14, value=9)
+
+    else :
+        with col_zoom:
+            st.markdown("### الطبقات")
+            show_douars = st.checkbox("الدواوير", value=False,disabled=(douars_geojson is None))
+            show_schools = st.checkbox("المدارس", value=False, disabled=(schools_geojson is None))
+            show_roads = st.checkbox("الطرق", value=False, disabled=(gdf_roads is None))
+
+            st.markdown("### إعدادات التكبير")
+            if mode == "Indice Régional":
+                zoom = st.slider("التكبير الأولي", min_value=5, max_value=14, value=7)
+            elif mode == "Indice National":
+                zoom = st.slider("التكبير الأولي", min_value=5, max_value=14, value=6)
+            else:
+                zoom = st.slider("التكبير الأولي", min_value=5, max_value=14, value=9)
+    # ============================================================
+    # Direction from social_codes.xlsx (up / down)
+    # ============================================================
+    direction_value = indicators[selected_code].direction
+
+    # ============================================================
+    # Metric + continuous RdYlGn colors
+    # ============================================================
+    gdf_social = get_map_layer("ct_driouch", COMMUNE_FIELDS + [selected_code])
+    metric_series_nonnull = gdf_social[selected_code].dropna()
+    if metric_series_nonnull.empty:
+        st.error("Pas de données numériques pour cet indice.")
+        st.stop()
+
+    # up => big values should be green => use RdYlGn (low red, high green)
+    # down => big values should be red => use reversed
+    # The map and the chart read these same colours
+    # (work on a copy: the shared layer must not be mutated)
+    gdf_social = gdf_social.assign(__color__=commune_colors(gdf_social, selected_code, direction_value))
+
+    # ============================================================
+    # Means: (level, value, colour from the Excel columns c_moy_pro / c_moy_reg / c_moy_nat)
+    # ============================================================
+    indicator = indicators[selected_code]
+    active_means = [(key, indicator.means[key], indicator.colors.get(key) or "#666666") for key in ("pro", "reg", "nat")]
+
+    # ------------------------------------------------------------
+    # D) Points / lines overlays (above polygons)
+    # Sent to st_folium as feature_group_to_add: ticking a layer adds or removes
+    # only its group on the map already in the browser, the base map above
+    # (choropleth, references) keeps the same script and is not re-drawn.
+    # ------------------------------------------------------------
+    def create_overlays():
+        groups = []
+        if show_douars:
+            fg_d = folium.FeatureGroup(name=("Douars" if lang == "Français" else "الدواوير"))
+            # Vector tiles when built (only the tiles in view are fetched), else inline GeoJSON
+            douars_layer = tile_layer("douars", {"radius": 5, "color": "darkgreen", "fillOpacity": 0.85},
+                                      DOUAR_FIELDS, "Douar", max_width=320)
+            if douars_layer is None:
+                douars_layer = point_layer(
+                    douars_geojson,
+                    marker=folium.CircleMarker(radius=5, color="darkgreen", fill=True, fill_opacity=0.85),
+                    tooltip_field="Douar",
+                    max_width=320,
+                )
+            douars_layer.add_to(fg_d)
+            groups.append(fg_d)
+
+        if show_schools and schools_geojson is not None:
+            fg_s = folium.FeatureGroup(name=("Écoles" if lang == "Français" else "المدارس"))
+            schools_tiles = tile_layer(schools_layer, {"radius": 6, "color": "#1f77b4", "fillOpacity": 0.85},
+                                       tooltip_field=["Nom_Etabli", "Nom"])
+            if schools_tiles is None:
+                schools_tiles = point_layer(
+                    schools_geojson,
+                    marker=folium.CircleMarker(radius=6, color="#1f77b4", fill=True, fill_opacity=0.85),
+                    tooltip_field=["Nom_Etabli", "Nom"],
+                    popup=False,
+                )
+            schools_tiles.add_to(fg_s)
+            groups.append(fg_s)
+
+        if show_roads and gdf_roads is not None:
+            fg_r = folium.FeatureGroup(name=("Routes" if lang == "Français" else "الطرق"))
+            folium.GeoJson(
+                roads_geojson,
+                style_function=lambda feat: {"color": "#444444", "weight": 2},
+                name=("Routes" if lang == "Français" else "الطرق"),
+            ).add_to(fg_r)
+            groups.append(fg_r)
+        return groups
+
+
+    with col_map:
+        m = clone_map(create_map(
+            layer_handle("ct_driouch"), workbook_handle("social_codes"), workbook_handle("moyen_indices"),
+            tuple(layer_handle(name) for name in (PROVINCIAL_LAYER, REGION_LAYER, NATIONAL_LAYER)),
+            selected_code, mode, lang, zoom,
+        ))
+        # Overlays and the layer control are added dynamically (see create_overlays)
+        map_out = st_folium(
+            m, width="100%", height=620,
+            feature_group_to_add=create_overlays(),
+            layer_control=folium.LayerControl(position="topright", collapsed=False),
+        )
+
+    # Optional: click selection by map click location -> find commune
+    selected_commune_name = None
+    if map_out and map_out.get("last_clicked"):
+        lat = map_out["last_clicked"]["lat"]
+        lon = map_out["last_clicked"]["lng"]
+        pt = Point(lon, lat)
+        hit = gdf_social[gdf_social.geometry.contains(pt)]
+        if not hit.empty:
+            selected_commune_name = hit.iloc[0].get("commune_fr", None)
+
+    # ============================================================
+    # CHART: same colors as map + ONLY active mean line
+    # ============================================================
+    with col_chart:
+        chart_df = gdf_social.copy()
+        if "commune_fr" not in chart_df.columns:
+            chart_df["commune_fr"] = chart_df.index.astype(str)
+        if "commune_ar" not in chart_df.columns:
+            chart_df["commune_ar"] = chart_df.index.astype(str)
+
+        chart_df = chart_df[["commune_fr", "commune_ar", selected_code, "__color__"]].dropna(subset=[selected_code])
+        chart_df = chart_df.sort_values(by=selected_code, ascending=False)
+
+        if lang == "Français":
+            x_field, x_title, y_title = "commune_fr", "Communes territoriales", "Pourcentage"
+        else:
+            x_field, x_title, y_title = "commune_ar", "الجماعات الترابية", "النسبة المئوية"
+
+        bars = (
+            alt.Chart(chart_df)
+            .mark_bar()
+            .encode(
+                x=alt.X(f"{x_field}:N", title=x_title, sort=alt.SortField(field=selected_code, order="descending")),
+                y=alt.Y(f"{selected_code}:Q", title=y_title),
+                color=alt.Color("__color__:N", scale=None, legend=None),
+                tooltip=[x_field, selected_code],
+            )
+            .properties(width="container", height=420)
+        )
+
+        # value labels
+        labels = (
+            alt.Chart(chart_df)
+            .mark_text(align="center", baseline="bottom", dy=-3, color="black", fontSize=11)
+            .encode(
+                x=alt.X(f"{x_field}:N", sort=alt.SortField(field=selected_code, order="descending")),
+                y=alt.Y(f"{selected_code}:Q"),
+                text=alt.Text(f"{selected_code}:Q", format=".1f"),
+            )
+        )
+
+        layers = [bars, labels]
+
+        # Active mean only
+        for key, mean_val, mean_color in active_means:
+            if mean_val is not None and not pd.isna(mean_val):
+                if lang == "Français":
+                    mean_label = {
+                        "pro": f"Moyenne provinciale: {mean_val}",
+                        "reg": f"Moyenne régionale: {mean_val}",
+                        "nat": f"Moyenne nationale: {mean_val}",
+                    }[key]
+                else:
+                    mean_label = {
+                        "pro": f"المتوسط الإقليمي: {mean_val}",
+                        "reg": f"المتوسط الجهوي: {mean_val}",
+                        "nat": f"المتوسط الوطني: {mean_val}",
+                    }[key]
+
+                mean_df = pd.DataFrame({"y": [mean_val], "label": [mean_label]})
+
+                mean_line = alt.Chart(mean_df).mark_rule(color=mean_color, strokeWidth=3, strokeDash=[5, 5]).encode(y="y:Q")
+                mean_text = (
+                    alt.Chart(mean_df)
+                    .mark_text(align="left", dx=120, dy=-8, color=mean_color, fontWeight="bold", fontSize=12)
+                    .encode(y="y:Q", text="label:N")
+                )
+                layers.extend([mean_line, mean_text])
+
+        # Optional: if a commune was clicked on map, emphasize it in chart (simple highlight)
+        if selected_commune_name and "commune_fr" in chart_df.columns:
+            sel = chart_df[chart_df["commune_fr"] == selected_commune_name]
+            if not sel.empty:
+                highlight = (
+                    alt.Chart(sel)
+                    .mark_bar(stroke="black", strokeWidth=2)
+                    .encode(
+                        x=alt.X(f"{x_field}:N", sort=alt.SortField(field=selected_code, order="descending")),
+                        y=alt.Y(f"{selected_code}:Q"),
+                        color=alt.value("#ffffff00"),
+                    )
+                )
+                layers.append(highlight)
+
+        final_chart = (
+            alt.layer(*layers)
+            .resolve_scale(color="independent")
+            .properties(
+                padding={"left": 20, "top": 25, "right": 20, "bottom": 10},
+                title=alt.Title(text=selected_label, anchor="middle", fontSize=16, fontWeight="bold", color="grey"),
+                background="white",
+                height=620,
+                width="container",
+            )
+            .configure_view(fill="white")
+            .configure_axis(labelColor="black", titleColor="black")
+            .configure_title(offset=60)
+        )
+
+        st.altair_chart(final_chart, use_container_width=True)
+
+        if selected_commune_name:
+            st.caption(f"Sélection carte: {selected_commune_name}")
@@ -0,0 +1,203 @@
+"""
+Vector tiles (MVT) for the dense point layers (douars, schools, wells).
+
+utils/ingest.py pre-cuts every tile of these layers, per zoom, from the
+normalized layer into client_portal/static/tiles/<layer>/<z>/<x>/<y>.pbf.
+Streamlit serves that folder as static files (enableStaticServing in the
+root .streamlit/config.toml), so a tile request is a plain file read, and the
+browser only fetches the tiles in view instead of the whole layer inlined in
+the map HTML.
+
+Cutting tiles needs the optional mapbox-vector-tile package
+(pip install mapbox-vector-tile). Without it, before the tiles are built or
+with static serving off, tile_layer() returns None and pages draw the GeoJSON
+point layer instead.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+from branca.element import MacroElement
+from folium.plugins import VectorGridProtobuf
+from folium.template import Template
+from folium.utilities import JsCode
+
+from utils.load_once import LAYERS, base_path, data_path, fresh, layer_handle, source_digest
+from utils.maps import static_url
+
+try:
+    import mapbox_vector_tile
+except ImportError:  # optional: only needed to cut tiles at ingest
+    mapbox_vector_tile = None
+
+tiles_path = base_path / "static" / "tiles"  # built by utils/ingest.py, served by Streamlit (static_url)
+
+EXTENT = 4096        # MVT tile coordinate space
+MIN_ZOOM = 5         # national view
+MAX_ZOOM = 14        # deeper zooms reuse (over-zoom) the zoom 14 tiles
+
+# Layers cut into tiles -> attributes kept in the tiles (tooltips/popups)
+TILE_LAYERS = {
+    "douars": ["Douar", "Milieu", "Popul"],
+    "educ_tot": ["Nom_Etabli", "Nature"],
+    "pacha_benteib_puits": ["Adresse", "Autorisati", "Profondeur"],
+    "pacha_midar_puits": ["Adresse", "Autorisati", "Profondeur"],
+}
+
+
+# ---------------------------
+# Cutting (ingest)
+# ---------------------------
+def _tile_xy(lon, lat, zoom):
+    # Fractional Web Mercator tile coordinates of lon/lat arrays
+    n = 2.0 ** zoom
+    lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n
+    return x, y
+
+
+def _properties(gdf, columns):
+    # JSON-safe attribute dicts (missing values dropped, numpy scalars unwrapped)
+    records = json.loads(gdf[columns].to_json(orient="records", force_ascii=False))
+    return [{k: v for k, v in r.items() if v is not None} for r in records]
+
+
+def build_tiles(name, gdf, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+    """
+    Write static/tiles/<name>/<z>/<x>/<y>.pbf for a normalized point layer
+    (EPSG:4326), one MVT layer named after the layer. Returns the number of tiles.
+    The tiles are cut into a fresh directory swapped in once complete, so a running
+    server never serves a half-cut set.
+    """
+    if mapbox_vector_tile is None:
+        raise ImportError("Cutting vector tiles needs mapbox-vector-tile (pip install mapbox-vector-tile).")
+    if not gdf.geom_type.eq("Point").all():
+        raise ValueError(f"{name}: only point layers are cut into tiles")
+
+    final = tiles_path / name
+    out = tiles_path / f".{name}.{os.getpid()}.tmp"
+    shutil.rmtree(out, ignore_errors=True)
+    out.mkdir(parents=True)
+    columns = [c for c in TILE_LAYERS.get(name, []) if c in gdf.columns]
+    properties = _properties(gdf, columns)
+    lon, lat = gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy()
+
+    count = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        x, y = _tile_xy(lon, lat, zoom)
+        tx, ty = np.floor(x).astype(int), np.floor(y).astype(int)
+        px = np.round((x - tx) * EXTENT).astype(int)
+        py = np.round((y - ty) * EXTENT).astype(int)
+        order = np.lexsort((ty, tx))
+        keys = np.stack([tx[order], ty[order]], axis=1)
+        starts = np.flatnonzero(np.r_[True, (np.diff(keys, axis=0) != 0).any(axis=1)])
+        for rows in np.split(order, starts[1:]):
+            features = [
+                {"geometry": f"POINT({px[i]} {py[i]})", "properties": properties[i]}
+                for i in rows
+            ]
+            tile = mapbox_vector_tile.encode(
+                [{"name": name, "features": features}],
+                default_options={"extents": EXTENT, "y_coord_down": True},
+            )
+            path = out / str(zoom) / str(tx[rows[0]]) / f"{ty[rows[0]]}.pbf"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(tile)
+            count += 1
+
+    src = data_path / LAYERS[name]
+    (out / "tiles.json").write_text(json.dumps({
+        "name": name, "minzoom": min_zoom, "maxzoom": max_zoom, "columns": columns, "tiles": count,
+        "sha1": source_digest(src) if src.exists() else None,
+    }), encoding="utf-8")
+
+    # Swap in the new set; the old one is removed once it is out of the way
+    old = tiles_path / f".{name}.{os.getpid()}.old"
+    if final.exists():
+        os.replace(final, old)
+    os.replace(out, final)
+    shutil.rmtree(old, ignore_errors=True)
+    return count
+
+
+# ---------------------------
+# Map layers (pages)
+# ---------------------------
+def tile_meta(name):
+    """tiles.json of a layer's tiles, or None if they are missing or not cut from the current layer file."""
+    path = tiles_path / name / "tiles.json"
+    if name not in LAYERS or not path.exists():
+        return None
+    meta = json.loads(path.read_text(encoding="utf-8"))
+    return meta if fresh(meta.get("sha1"), data_path / LAYERS[name]) else None
+
+
+class _TileEvents(MacroElement):
+    # Tooltip on hover and popup on click for the features of a vector-grid layer
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function (grid) {
+            const esc = v => String(v ?? "").replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;");
+            const fields = {{ this.fields|tojson }};
+            const tooltipFields = {{ this.tooltip_fields|tojson }};
+            grid.on("click", function (e) {
+                if (!fields.length) { return; }
+                const p = e.layer.properties;
+                L.popup({maxWidth: {{ this.max_width }}})
+                    .setLatLng(e.latlng)
+                    .setContent(fields.map(([label, col]) => "<b>" + label + ":</b> " + esc(p[col]) + "<br>").join(""))
+                    .openOn(grid._map);
+            });
+            grid.on("mouseover", function (e) {
+                const col = tooltipFields.find(c => e.layer.properties[c] != null);
+                if (col === undefined) { return; }
+                grid._tooltip = L.tooltip({sticky: true})
+                    .setLatLng(e.latlng)
+                    .setContent(esc(e.layer.properties[col]))
+                    .addTo(grid._map);
+            });
+            grid.on("mouseout", function () {
+                if (grid._tooltip) { grid._tooltip.remove(); grid._tooltip = null; }
+            });
+        })({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, fields, tooltip_fields, max_width):
+        super().__init__()
+        self._name = "TileEvents"
+        self.fields = [list(f) for f in fields or ()]
+        self.tooltip_fields = tooltip_fields
+        self.max_width = int(max_width)
+
+
+def tile_layer(name, style, popup_fields=None, tooltip_field=None, max_width=300, layer_name=None):
+    """
+    Vector-tile layer of a point layer (None if its tiles are not built or stale,
+    or static serving is off: draw utils.points.point_layer instead). `style` is the Leaflet path style of
+    every point (radius, color, fillOpacity...); `popup_fields` are (label, column)
+    pairs shown on click, `tooltip_field` a column (or several, first present) on hover.
+    """
+    meta = tile_meta(name)
+    handle = layer_handle(name)
+    url = static_url("tiles", name, "{z}", "{x}", "{y}.pbf")
+    if meta is None or handle is None or url is None:
+        return None
+    grid = VectorGridProtobuf(
+        f"{url}?v={handle.version[:12]}",
+        name=layer_name,
+        options={
+            "rendererFactory": JsCode("L.canvas.tile"),
+            "interactive": True,
+            "minNativeZoom": meta["minzoom"],
+            "maxNativeZoom": meta["maxzoom"],
+            # raw JSON: folium would camelize the MVT layer name ("educ_tot" -> "educTot")
+            "vectorTileLayerStyles": JsCode(json.dumps({name: dict({"fill": True}, **style)})),
+        },
+    )
+    tooltip_fields = [] if tooltip_field is None else (
+        [tooltip_field] if isinstance(tooltip_field, str) else list(tooltip_field))
+    grid.add_child(_TileEvents(popup_fields, tooltip_fields, max_width))
+    return grid
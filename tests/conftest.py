@@ -0,0 +1,26 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The portal imports its helpers as `utils.*`, from client_portal/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "client_portal"))
+
+
+@pytest.fixture
+def shared_data(tmp_path, monkeypatch):
+    """Point the loader and the ingest at empty shared_data folders under tmp_path."""
+    import utils.ingest
+    import utils.load_once
+
+    paths = {
+        "data_path": tmp_path / "geojson_files",
+        "parquet_path": tmp_path / "geoparquet",
+        "columns_path": tmp_path / "columns",
+    }
+    for attr, path in paths.items():
+        path.mkdir()
+        monkeypatch.setattr(utils.load_once, attr, path)
+        if hasattr(utils.ingest, attr):
+            monkeypatch.setattr(utils.ingest, attr, path)
+    return tmp_path
@@ -0,0 +1,55 @@
+import matplotlib
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.colors import LinearSegmentedColormap, Normalize, to_hex, to_rgb
+
+from utils.colors import LUT_SIZE, MISSING_COLOR, YLORRD, color_lut, colors_for
+
+
+def _rgb255(color):
+    return np.round(np.array(to_rgb(color)) * 255)
+
+
+@pytest.mark.parametrize("name", ["RdYlGn", "RdYlGn_r", "autumn_r"])
+def test_color_lut_samples_the_matplotlib_colormap(name):
+    lut = color_lut(name)
+    assert len(lut) == LUT_SIZE
+    assert not lut.flags.writeable
+    cmap = matplotlib.colormaps[name]
+    assert lut[0] == to_hex(cmap(0.0))
+    assert lut[-1] == to_hex(cmap(1.0))
+
+
+def test_color_lut_of_colour_stops():
+    lut = color_lut(YLORRD)
+    assert lut[0].lower() == YLORRD[0].lower()
+    assert lut[-1].lower() == YLORRD[-1].lower()
+
+
+@pytest.mark.parametrize("cmap", ["RdYlGn", "RdYlGn_r", YLORRD])
+def test_colors_for_matches_per_value_matplotlib(cmap):
+    # The former per-row path: to_hex(cmap(norm(v))) for every value
+    values = np.linspace(-3.0, 17.0, 101)
+    vmin, vmax = 0.0, 15.0
+    colormap = (matplotlib.colormaps[cmap] if isinstance(cmap, str)
+                else LinearSegmentedColormap.from_list("stops", cmap))
+    norm = Normalize(vmin=vmin, vmax=vmax, clip=True)
+    expected = [to_hex(colormap(norm(v))) for v in values]
+    got = colors_for(values, vmin, vmax, cmap)
+    for e, g in zip(expected, got):
+        assert np.abs(_rgb255(e) - _rgb255(g)).max() <= 2  # one LUT step
+
+
+def test_colors_for_keeps_the_series_index_and_marks_missing_values():
+    values = pd.Series([1.0, None, 3.0], index=["a", "b", "c"])
+    colors = colors_for(values, 1.0, 3.0)
+    assert colors.index.tolist() == ["a", "b", "c"]
+    assert colors["b"] == MISSING_COLOR
+    assert colors["a"] == color_lut("RdYlGn")[0]
+    assert colors["c"] == color_lut("RdYlGn")[-1]
+
+
+def test_colors_for_constant_column_and_scalar():
+    assert set(colors_for(np.array([2.0, 2.0]), 2.0, 2.0)) == {color_lut("RdYlGn")[0]}
+    assert colors_for(5.0, 0.0, 10.0) == color_lut("RdYlGn")[LUT_SIZE // 2]
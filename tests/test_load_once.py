@@ -0,0 +1,94 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from utils import load_once
+from utils.ingest import build_column_store
+from utils.load_once import built_from, fresh, open_column_store, source_digest, views_buffer
+
+
+def _source(shared_data, name="douars", content=b'{"type": "FeatureCollection", "features": []}'):
+    src = shared_data / "geojson_files" / load_once.LAYERS[name]
+    src.write_bytes(content)
+    return src
+
+
+def _store(shared_data, name="douars", popul=(120, 80, 45)):
+    src = _source(shared_data, name)
+    return src, build_column_store(name, pd.DataFrame({"Popul": list(popul)}), source_digest(src))
+
+
+def test_built_from_records_the_source_digest(shared_data):
+    src, store = _store(shared_data)
+    assert built_from(store) == source_digest(src)
+    assert fresh(built_from(store), src)
+
+
+def test_artifact_is_stale_once_the_source_changes(shared_data):
+    src, store = _store(shared_data)
+    digest = built_from(store)
+    src.write_bytes(b'{"type": "FeatureCollection", "features": [null]}')
+    assert not fresh(digest, src)
+    assert open_column_store("douars") == {}
+
+
+def test_artifact_is_stale_when_a_copy_keeps_the_old_mtime(shared_data):
+    # cp -p / unzip restore the mtime of a replaced file: only its content tells
+    src, store = _store(shared_data)
+    stat = src.stat()
+    source_digest(src)  # hashed once, as the running app would have
+    src.write_bytes(b'{"type": "FeatureCollection", "features": {}}')  # same size
+    os.utime(src, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert src.stat().st_size == stat.st_size
+    assert not fresh(built_from(store), src)
+
+
+def test_missing_or_unrecorded_artifacts_are_never_fresh(shared_data):
+    src = _source(shared_data)
+    assert built_from(shared_data / "columns" / "douars.arrow") is None
+    assert not fresh(None, src)
+    plain = shared_data / "columns" / "plain.arrow"
+    table = pa.table({"Popul": [1, 2]})
+    with pa.OSFile(str(plain), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    assert built_from(plain) is None
+
+
+def test_artifact_without_its_source_is_kept(shared_data):
+    src, store = _store(shared_data)
+    src.unlink()
+    assert fresh(built_from(store), src)
+
+
+def _mapped_ranges(path):
+    # Address ranges of the process mappings of a file
+    ranges = []
+    for line in Path("/proc/self/maps").read_text().splitlines():
+        fields = line.split(maxsplit=5)
+        if len(fields) == 6 and fields[5] == str(path):
+            start, end = (int(a, 16) for a in fields[0].split("-"))
+            ranges.append((start, end))
+    return ranges
+
+
+@pytest.mark.skipif(not Path("/proc/self/maps").exists(), reason="needs /proc/self/maps")
+def test_column_store_arrays_are_views_on_the_mapped_file(shared_data):
+    _, store = _store(shared_data, popul=range(1000))
+    columns = open_column_store("douars")
+    popul = columns["Popul"]
+    assert popul.tolist() == list(range(1000))
+    assert not popul.flags.writeable
+    start = popul.__array_interface__["data"][0]
+    assert any(lo <= start and start + popul.nbytes <= hi for lo, hi in _mapped_ranges(store.resolve()))
+
+
+def test_views_buffer():
+    buffer = pa.py_buffer(np.arange(8, dtype="int64").tobytes())
+    view = np.frombuffer(buffer, dtype="int64")
+    assert views_buffer(view, buffer)
+    assert views_buffer(view[2:5], buffer)
+    assert not views_buffer(view.copy(), buffer)
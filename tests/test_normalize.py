@@ -0,0 +1,68 @@
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import Point, Polygon
+
+from utils.normalize import normalize_layer, numeric_text
+
+
+def test_numeric_text_parses_numbers_kept_as_text():
+    values = numeric_text(pd.Series(["1", " 2.5", None], dtype=object))
+    assert values.tolist()[:2] == [1.0, 2.5]
+    assert pd.isna(values.iloc[2])
+
+
+@pytest.mark.parametrize("column", [
+    ["021670301", "021670302", "021670303"],  # fixed-width codes with leading zeros
+    ["01", "02", "10"],
+    ["12", "57?", "3"],                       # not every value is a number
+    ["", "1"],
+])
+def test_numeric_text_keeps_text(column):
+    assert numeric_text(pd.Series(column, dtype=object)) is None
+
+
+def test_numeric_text_leading_zero_of_variable_width_is_a_number():
+    assert numeric_text(pd.Series(["05", "120"], dtype=object)).tolist() == [5, 120]
+
+
+def test_numeric_text_ignores_numeric_columns():
+    assert numeric_text(pd.Series([1, 2])) is None
+
+
+def test_normalize_layer_drops_unusable_rows_and_rebuilds_points():
+    gdf = gpd.GeoDataFrame(
+        {
+            "code": ["021670301", "021670302", "021670303", "021670304", "021670305"],
+            "Popul": ["120", "80", "45", "7", "9"],
+            "Coord_Lon": [None, None, "-3.4", None, None],
+            "Coord_Lat": [None, None, "34.9", None, None],
+        },
+        geometry=[
+            Point(-3.39, 34.95),
+            Point(-1.8e308, -1.8e308),  # junk sentinel
+            None,                       # rebuilt from Coord_Lon / Coord_Lat
+            Polygon(),                  # empty
+            Point(200, 95),             # out of lon/lat range
+        ],
+        crs="EPSG:4326",
+    )
+    out = normalize_layer(gdf)
+    assert out["code"].tolist() == ["021670301", "021670303"]
+    assert out.index.tolist() == [0, 1]
+    assert (out.geometry.x.tolist(), out.geometry.y.tolist()) == ([-3.39, -3.4], [34.95, 34.9])
+    assert pd.api.types.is_numeric_dtype(out["Popul"])
+    assert not pd.api.types.is_numeric_dtype(out["code"])
+    assert gdf["Popul"].tolist()[0] == "120"  # the input is left as-is
+
+
+def test_normalize_layer_reprojects_to_wgs84():
+    gdf = gpd.GeoDataFrame(geometry=[Point(-3.39, 34.95)], crs="EPSG:4326").to_crs("EPSG:26191")
+    out = normalize_layer(gdf)
+    assert out.crs.to_epsg() == 4326
+    assert out.geometry.x.iloc[0] == pytest.approx(-3.39)
+    assert out.geometry.y.iloc[0] == pytest.approx(34.95)
+
+
+def test_normalize_layer_sets_missing_crs():
+    assert normalize_layer(gpd.GeoDataFrame(geometry=[Point(-3.39, 34.95)])).crs.to_epsg() == 4326
@@ -0,0 +1,52 @@
+import html
+import re
+from html.parser import HTMLParser
+
+import pytest
+
+from utils.popups import ROW_SEP, clicked_row, row_tooltip
+
+
+class _Text(HTMLParser):
+    # textContent of an HTML fragment: hidden elements included, like the DOM's
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def _clicked_tooltip(handler, feature_id, value):
+    """
+    What st_folium reports as `last_object_clicked_tooltip` for a marker drawn
+    with `handler`: the textContent of the tooltip it binds.
+    """
+    expr = re.search(r"layer\.bindTooltip\((.*)\);", handler.js_code).group(1)
+    expr = expr.replace("feature.id", repr(feature_id)).replace("text.innerHTML", repr(html.escape(value, quote=False)))
+    bound = eval(expr, {})  # a concatenation of string literals
+    parser = _Text()
+    parser.feed(bound)
+    return "".join(parser.parts)
+
+
+@pytest.mark.parametrize("feature_id, value", [
+    ("0", "Bureau 1"),
+    ("362", "École <Al Amal> | 2: bis"),
+    ("41", ""),
+])
+def test_row_tooltip_round_trip(feature_id, value):
+    tooltip = _clicked_tooltip(row_tooltip("bv", "Nom_du__bu"), feature_id, value)
+    assert tooltip.endswith(value)
+    assert clicked_row(tooltip, "bv") == int(feature_id)
+
+
+def test_clicked_row_of_another_layer():
+    tooltip = _clicked_tooltip(row_tooltip("douars", "Douar"), "7", "Tazaghine")
+    assert clicked_row(tooltip, "bv") is None
+    assert clicked_row(tooltip, "douars") == 7
+
+
+@pytest.mark.parametrize("tooltip", [None, "", "Bureau 1", f"bv:x{ROW_SEP}Bureau", f"bv{ROW_SEP}Bureau"])
+def test_clicked_row_without_a_row(tooltip):
+    assert clicked_row(tooltip, "bv") is None